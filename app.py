@@ -1,5 +1,29 @@
+import threading
+
 import dash
 import dash_bootstrap_components as dbc
 
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
+
+# Loaded leagues and computed statistics shared by every page of the app. Built on first use so that
+# starting the server does not import utils (pandas, numpy, pyarrow, plotly).
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def _shared_instance(name, factory):
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+        return _shared[name]
+
+
+def get_registry():
+    import utils
+    return _shared_instance('registry', utils.DataRegistry)
+
+
+def get_figure_cache():
+    import utils
+    return _shared_instance('figure_cache', utils.FigureCache)
@@ -1,13 +1,14 @@
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output, State
-from app import app
-import utils
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from app import app, get_registry
 import dash_bootstrap_components as dbc
 
+import config
+import metrics
+import profiling
+from apps import common
+
 league_tab_mapping = {
     'tab-1': 'england',
     'tab-2': 'france',
@@ -16,14 +17,12 @@ league_tab_mapping = {
     'tab-5': 'italy',
 }
 
-loader = utils.Loader()
-statistic_collector = utils.StatisticCollector()
-
 layout = html.Div([
     dbc.NavbarSimple(
         children=[
             dbc.NavItem(dbc.NavLink("Teams Analysis", href='/apps/app1')),
             dbc.NavItem(dbc.NavLink("Players Analysis", href='/apps/app2')),
+            dbc.NavItem(dbc.NavLink("Leagues Comparison", href='/apps/app3')),
         ],
         brand="Soccer Analysis",
         brand_href="/",
@@ -39,19 +38,37 @@ layout = html.Div([
             dcc.Tab(label='Germany', value='tab-4'),
             dcc.Tab(label='Italy', value='tab-5'),
         ]),
-    html.Div(id='indicator-graphic-teams')
+    html.Div(id='indicator-graphic-teams'),
+    html.Div(children=[
+        html.H4('Match timeline'),
+        dbc.Row([dbc.Col(dcc.Dropdown(id='timeline-team', placeholder='Team')),
+                 dbc.Col(dcc.Dropdown(id='timeline-match', placeholder='Season average'))]),
+        dcc.Graph(id='timeline-graph'),
+    ], style={"margin": "20px"}),
+    dcc.Interval(id='teams-job-interval', interval=config.JOB_POLL_INTERVAL_MS, disabled=True)
 ])
 
 
-@app.callback(Output('indicator-graphic-teams', 'children'),
-              Input(component_id='tabs-example', component_property='value'))
-def render_content(tab):
-    if league_tab_mapping[tab] not in loader.cache:
-        loader(input_league=league_tab_mapping[tab])
-    if league_tab_mapping[tab] not in statistic_collector.cache.keys():
-        table_teams, passing_data, shoting_data, _, _ = statistic_collector(league_tab_mapping[tab])
-    else:
-        table_teams, passing_data, shoting_data, _, _ = statistic_collector.cache[league_tab_mapping[tab]]
+@app.callback([Output('indicator-graphic-teams', 'children'),
+               Output('teams-job-interval', 'disabled')],
+              [Input(component_id='tabs-example', component_property='value'),
+               Input(component_id='teams-job-interval', component_property='n_intervals')])
+@metrics.instrument('callback_app1')
+@profiling.profiled('callback_app1')
+def render_content(tab, n_intervals=None):
+    league = league_tab_mapping[tab]
+    return common.render_leagues([league], lambda: cached_content(league))
+
+
+def cached_content(league):
+    return common.cached_content('app1', [league], lambda: build_content(league))
+
+
+def build_content(league):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    table_teams, passing_data, shoting_data, _, _ = get_registry().statistic(league)
     goals_bar = px.bar(table_teams, x='team_name', y='goals', text='position', color='points', title="Goals by team")
     goals_bar.update_layout(xaxis={'categoryorder': 'total descending'})
 
@@ -65,8 +82,7 @@ def render_content(tab):
     goals_points_corr = px.scatter(passing_data, x="goals", y="points", trendline="ols")
     passes_points_corr = px.scatter(passing_data, x="accurate_passes_per_match", y="points", trendline="ols")
     shots_points_corr = px.scatter(shoting_data, x="accurate_shots_per_match", y="points", trendline="ols")
-    parralel_data = pd.concat([passing_data, shoting_data["accurate_shots_per_match"]], axis=1)
-    parrallel_figure = px.parallel_coordinates(parralel_data, color="points",
+    parrallel_figure = px.parallel_coordinates(passing_data, color="points",
                                                dimensions=["accurate_passes_per_match", "accurate_shots_per_match",
                                                            "goals", "position"],
                                                labels={"accurate_passes_per_match": "Accurate Passes amount per game",
@@ -105,3 +121,75 @@ def render_content(tab):
 
     return graph
 
+
+
+@app.callback([Output('timeline-team', 'options'),
+               Output('timeline-team', 'value')],
+              [Input(component_id='tabs-example', component_property='value'),
+               Input(component_id='teams-job-interval', component_property='disabled')])
+def update_timeline_teams(tab, job_done=None):
+    # Re-run when the league job finishes (the interval gets disabled) to fill in the teams.
+    league = league_tab_mapping[tab]
+    if not get_registry().is_ready(league):
+        return [], None
+    import utils
+    team_names = utils.get_team_names(league)
+    options = [{'label': name, 'value': team_id}
+               for team_id, name in sorted(team_names.items(), key=lambda item: item[1])]
+    return options, options[0]['value'] if options else None
+
+
+@app.callback(Output('timeline-match', 'options'),
+              [Input(component_id='timeline-team', component_property='value')],
+              [State(component_id='tabs-example', component_property='value')])
+def update_timeline_matches(team_id, tab):
+    league = league_tab_mapping[tab]
+    if team_id is None or not get_registry().is_ready(league):
+        return []
+    import utils
+    cube, team_names = utils.get_timeline_cube(league), utils.get_team_names(league)
+    options = []
+    for match_id in cube.team_matches(team_id):
+        opponents = [opponent for opponent in cube.match_teams(match_id) if opponent != team_id]
+        opponent = team_names.get(opponents[0], opponents[0]) if opponents else '?'
+        options.append({'label': f"Match {match_id} vs {opponent}", 'value': match_id})
+    return options
+
+
+@app.callback(Output('timeline-graph', 'figure'),
+              [Input(component_id='timeline-team', component_property='value'),
+               Input(component_id='timeline-match', component_property='value')],
+              [State(component_id='tabs-example', component_property='value')])
+@metrics.instrument('callback_timeline')
+def render_timeline(team_id, match_id, tab):
+    league = league_tab_mapping[tab]
+    if team_id is None or not get_registry().is_ready(league):
+        return {}
+    import utils
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    cube, team_names = utils.get_timeline_cube(league), utils.get_team_names(league)
+    figure = make_subplots(rows=3, cols=1, shared_xaxes=True,
+                           subplot_titles=("Pass accuracy", "Shots", "Goals"))
+    if match_id is None or match_id not in cube.team_matches(team_id):
+        title = f"{team_names.get(team_id, team_id)}: season average per match"
+        curves = [(team_names.get(team_id, team_id), cube.team_accuracy_curve(team_id),
+                   cube.team_curve(team_id, 'Shot'), cube.team_curve(team_id, 'Shot', 'goals'))]
+    else:
+        title = f"Match {match_id}"
+        passes = cube.match_timeline(match_id, 'Pass')
+        accurate_passes = cube.match_timeline(match_id, 'Pass', 'accurate')
+        shots = cube.match_timeline(match_id, 'Shot')
+        goals = cube.match_timeline(match_id, 'Shot', 'goals')
+        curves = [(team_names.get(team, team), (accurate_passes[team] / passes[team].where(passes[team] > 0)).values,
+                   shots[team].values, goals[team].values) for team in passes.columns if team >= 0]
+    minutes = list(range(1, cube.data.shape[2] + 1))
+    for name, accuracy, shots, goals in curves:
+        for row, values in enumerate((accuracy, shots, goals), start=1):
+            figure.add_trace(go.Scatter(x=minutes, y=values, name=str(name), legendgroup=str(name),
+                                        showlegend=row == 1, mode='lines'), row=row, col=1)
+    figure.update_xaxes(title_text="Minute", row=3, col=1)
+    figure.update_yaxes(tickformat='.0%', row=1, col=1)
+    figure.update_layout(title=title, height=700, transition_duration=500)
+    return figure
@@ -1,13 +1,14 @@
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output, State
-from app import app
-import utils
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from app import app, get_registry
 import dash_bootstrap_components as dbc
 
+import config
+import metrics
+import profiling
+from apps import common
+
 league_tab_mapping = {
     'tab-1': 'england',
     'tab-2': 'france',
@@ -16,9 +17,6 @@ league_tab_mapping = {
     'tab-5': 'italy',
 }
 
-loader = utils.Loader()
-statistic_collector = utils.StatisticCollector()
-
 
 best_scorrer = dbc.Card(
     [
@@ -62,6 +60,7 @@ layout = html.Div([
         children=[
             dbc.NavItem(dbc.NavLink("Teams Analysis", href='/apps/app1')),
             dbc.NavItem(dbc.NavLink("Players Analysis", href='/apps/app2')),
+            dbc.NavItem(dbc.NavLink("Leagues Comparison", href='/apps/app3')),
         ],
         brand="Soccer Analysis",
         brand_href="/",
@@ -77,20 +76,31 @@ layout = html.Div([
             dcc.Tab(label='Germany', value='tab-4'),
             dcc.Tab(label='Italy', value='tab-5'),
         ]),
-    html.Div(id='indicator-graphic-players')
+    html.Div(id='indicator-graphic-players'),
+    dcc.Interval(id='players-job-interval', interval=config.JOB_POLL_INTERVAL_MS, disabled=True)
 ])
 
 
 
-@app.callback(Output('indicator-graphic-players', 'children'),
-              Input(component_id='tabs-example', component_property='value'))
-def render_content(tab):
-    if league_tab_mapping[tab] not in loader.cache:
-        loader(input_league=league_tab_mapping[tab])
-    if league_tab_mapping[tab] not in statistic_collector.cache.keys():
-        _, _, _, best_scorrers, best_assistants = statistic_collector(league_tab_mapping[tab])
-    else:
-        _, _, _, best_scorrers, best_assistants = statistic_collector.cache[league_tab_mapping[tab]]
+@app.callback([Output('indicator-graphic-players', 'children'),
+               Output('players-job-interval', 'disabled')],
+              [Input(component_id='tabs-example', component_property='value'),
+               Input(component_id='players-job-interval', component_property='n_intervals')])
+@metrics.instrument('callback_app2')
+@profiling.profiled('callback_app2')
+def render_content(tab, n_intervals=None):
+    league = league_tab_mapping[tab]
+    return common.render_leagues([league], lambda: cached_content(league))
+
+
+def cached_content(league):
+    return common.cached_content('app2', [league], lambda: build_content(league))
+
+
+def build_content(league):
+    import plotly.graph_objects as go
+
+    _, _, _, best_scorrers, best_assistants = get_registry().statistic(league)
     position_scorers = [i for i in range(1, len(best_scorrers)+1)]
     position_assistants = [i for i in range(1, len(best_assistants) +1)]
 
@@ -122,20 +132,10 @@ def render_content(tab):
                        height=30))
     ])
     results_table_scorers.update_layout(xaxis={'categoryorder': 'total descending'}, transition_duration=500)
-    scorer_team_names = []
-    for team_id in best_scorrers.team_id:
-        try:
-            team_name = str(utils.get_team_name_by_id(team_id, league_tab_mapping[tab])[0])
-        except:
-            team_name = str(utils.get_team_name_by_id(team_id, league_tab_mapping[tab]))
-        scorer_team_names.append(f"Team Name: {team_name} - Team id: {team_id}")
-    assistants_team_names = []
-    for team_id in best_assistants.team_id:
-        try:
-            team_name = str(utils.get_team_name_by_id(team_id, league_tab_mapping[tab])[0])
-        except:
-            team_name = str(utils.get_team_name_by_id(team_id, league_tab_mapping[tab]))
-        assistants_team_names.append(f"Team Name: {team_name} - Team id: {team_id}")
+    scorer_team_names = [f"Team Name: {team_name} - Team id: {team_id}"
+                         for team_name, team_id in zip(best_scorrers.team_name, best_scorrers.team_id)]
+    assistants_team_names = [f"Team Name: {team_name} - Team id: {team_id}"
+                             for team_name, team_id in zip(best_assistants.team_name, best_assistants.team_id)]
     colors = ['gold', 'mediumturquoise', 'darkorange', 'lightgreen']
     assistants_fig = go.Figure(data=[go.Pie(labels=assistants_team_names, values=best_assistants.assist_amount)])
     assistants_fig.update_traces(hoverinfo='label+percent', textinfo='value', textfont_size=20,
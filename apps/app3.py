@@ -0,0 +1,105 @@
+import dash_core_components as dcc
+import dash_html_components as html
+from dash.dependencies import Input, Output
+from app import app, get_registry
+import dash_bootstrap_components as dbc
+
+import config
+import metrics
+import profiling
+from apps import common
+
+league_options = [
+    {'label': 'England', 'value': 'england'},
+    {'label': 'France', 'value': 'france'},
+    {'label': 'Spain', 'value': 'spain'},
+    {'label': 'Germany', 'value': 'germany'},
+    {'label': 'Italy', 'value': 'italy'},
+]
+
+layout = html.Div([
+    dbc.NavbarSimple(
+        children=[
+            dbc.NavItem(dbc.NavLink("Teams Analysis", href='/apps/app1')),
+            dbc.NavItem(dbc.NavLink("Players Analysis", href='/apps/app2')),
+            dbc.NavItem(dbc.NavLink("Leagues Comparison", href='/apps/app3')),
+        ],
+        brand="Soccer Analysis",
+        brand_href="/",
+        color="dark",
+        dark=True,
+    ),
+    html.B(),
+    html.H2('Leagues comparison', title="Players and teams of several leagues side by side"),
+    dcc.Checklist(id='compare-leagues', options=league_options,
+                  value=[option['value'] for option in league_options],
+                  labelStyle={'display': 'inline-block', 'margin-right': '20px'}),
+    html.Div(id='indicator-graphic-compare'),
+    dcc.Interval(id='compare-job-interval', interval=config.JOB_POLL_INTERVAL_MS, disabled=True)
+])
+
+
+@app.callback([Output('indicator-graphic-compare', 'children'),
+               Output('compare-job-interval', 'disabled')],
+              [Input(component_id='compare-leagues', component_property='value'),
+               Input(component_id='compare-job-interval', component_property='n_intervals')])
+@metrics.instrument('callback_app3')
+@profiling.profiled('callback_app3')
+def render_content(leagues, n_intervals=None):
+    if not leagues:
+        return dbc.Alert("Select at least one league.", color="info", style={"margin": "50px"}), True
+    return common.render_leagues(leagues, lambda: cached_content(leagues))
+
+
+def cached_content(leagues):
+    leagues = sorted(leagues)
+    return common.cached_content('app3', leagues, lambda: build_content(leagues))
+
+
+def _leaderboard_table(leaderboard, amount_column, amount_title):
+    import plotly.graph_objects as go
+    table = go.Figure(data=[
+        go.Table(
+            header=dict(values=['Position', 'Player Name', 'League', 'Team Name', amount_title],
+                        fill_color='paleturquoise',
+                        align='left',
+                        height=20),
+            cells=dict(values=[list(range(1, len(leaderboard) + 1)), leaderboard.player_name,
+                               leaderboard.league.str.capitalize(), leaderboard.team_name,
+                               leaderboard[amount_column]],
+                       fill_color='lavender',
+                       align='left',
+                       font_size=14,
+                       height=30))
+    ])
+    table.update_layout(transition_duration=500)
+    return table
+
+
+def build_content(leagues):
+    import plotly.express as px
+
+    best_scorrers, best_assistants, teams = get_registry().comparison(leagues)
+    scorers_table = _leaderboard_table(best_scorrers, 'goals_amount', 'Goals Amount')
+    assistants_table = _leaderboard_table(best_assistants, 'assist_amount', 'Assist Amount')
+    scorers_table.update_layout(title="Top 20 Scorers")
+    assistants_table.update_layout(title="Top 20 Assistants")
+
+    passes_points = px.scatter(teams, x="accurate_passes_per_match", y="points", color="league",
+                               hover_name="team_name", title="Accurate passes per game and points")
+    goals_by_league = px.box(teams, x="league", y="goals_per_match", color="league", points="all",
+                             hover_name="team_name", title="Goals per game by league")
+    shots_by_league = px.box(teams, x="league", y="accurate_shots_per_match", color="league", points="all",
+                             hover_name="team_name", title="Accurate shots per game by league")
+
+    graph = html.Div(
+        children=[
+            dbc.Row([dbc.Col(dcc.Graph(figure=scorers_table)),
+                     dbc.Col(dcc.Graph(figure=assistants_table))]),
+            dcc.Graph(figure=passes_points),
+            dbc.Row([dbc.Col(dcc.Graph(figure=goals_by_league)),
+                     dbc.Col(dcc.Graph(figure=shots_by_league))]),
+        ],
+    )
+
+    return graph
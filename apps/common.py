@@ -0,0 +1,65 @@
+import dash
+import dash_html_components as html
+import dash_bootstrap_components as dbc
+import flask
+
+from app import get_registry, get_figure_cache
+
+JOB_STAGES = {
+    'idle': (0, 'Waiting to start'),
+    'queued': (10, 'Queued'),
+    'loading': (40, 'Loading match events'),
+    'computing': (75, 'Computing statistics'),
+    'ready': (100, 'Rendering charts'),
+}
+
+
+def loading_placeholder(league, stage):
+    if stage == 'failed':
+        return dbc.Alert(f"Could not load data for {league.capitalize()}. Select the tab again to retry.",
+                         color="danger", style={"margin": "50px"})
+    percent, label = JOB_STAGES.get(stage, JOB_STAGES['idle'])
+    return html.Div(children=[
+        html.H5(f"Preparing {league.capitalize()}: {label} ..."),
+        dbc.Progress(value=percent, striped=True, animated=True),
+    ],
+        style={"margin": "50px"})
+
+
+def _interval_tick():
+    # True when only a page's job interval fired the callback, not a league selection.
+    if not flask.has_request_context():
+        return False
+    triggered = dash.callback_context.triggered
+    return bool(triggered) and all(trigger['prop_id'].endswith('.n_intervals') for trigger in triggered)
+
+
+def render_leagues(leagues, content):
+    """(children, interval disabled) of a page showing leagues.
+
+    Cold leagues are loaded in the background and the page polls through its interval until
+    they are ready; content() renders the page once they are. Jobs are queued only when the
+    leagues were selected or have no job at all, so a failed job stays failed until the user
+    selects its league again.
+    """
+    registry = get_registry()
+    cold_leagues = [league for league in leagues if not registry.is_ready(league)]
+    if not cold_leagues:
+        return content(), True
+    selected = not _interval_tick()
+    for league in cold_leagues:
+        # On a poll, only a league with no job at all (e.g. its result was evicted) is queued again.
+        if selected or registry.progress(league) == 'idle':
+            registry.submit(league)
+    stages = {league: registry.progress(league) for league in cold_leagues}
+    failed = [league for league, stage in stages.items() if stage == 'failed']
+    # Show the first failed league, or else the first one still running.
+    league = failed[0] if failed else cold_leagues[0]
+    return loading_placeholder(league, stages[league]), bool(failed)
+
+
+def cached_content(page, leagues, build):
+    """Rendered content of page for leagues, built (plotting imports included) once per data version."""
+    import utils
+    versions = tuple(utils.get_data_version(league) for league in leagues)
+    return get_figure_cache().get_or_build((page, ','.join(leagues), versions), build)
@@ -0,0 +1,83 @@
+"""Compares the wide and compact {league}_events layouts on synthetic data.
+
+    python -m benchmarks.bench_schema --matches 380 --output schema.json
+
+For each layout the league is ingested into a fresh database, which is then vacuumed
+and measured: file size, events table size (when SQLite has dbstat), ingest time and
+the time of a full events scan (refresh_rollups) and of StatisticCollector.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import config
+from benchmarks.generate_data import generate
+from benchmarks.run_benchmarks import LEAGUE, _measure
+
+
+def _table_bytes(conn_data, table):
+    try:
+        query = 'SELECT sum(pgsize) FROM dbstat WHERE name=? OR name IN ' \
+                '(SELECT name FROM sqlite_master WHERE type="index" AND tbl_name=?)'
+        return conn_data.execute(query, (table, table)).fetchone()[0]
+    except Exception:
+        return None
+
+
+def measure_layout(utils, database, layout, repeat):
+    config.EVENTS_SCHEMA = layout
+    utils.configure_db_pool(database)
+    shutil.rmtree(os.path.dirname(database), ignore_errors=True)
+    started = time.perf_counter()
+    utils.Loader()(LEAGUE)
+    ingest = time.perf_counter() - started
+    with utils.db_pool.write() as conn_data:
+        conn_data.execute('VACUUM')
+
+    def rescan():
+        with utils.db_pool.write() as conn_data:
+            utils.refresh_rollups(conn_data.cursor(), LEAGUE)
+
+    with utils.db_pool.read() as conn_data:
+        events_bytes = _table_bytes(conn_data, f"{LEAGUE}_events")
+    return {
+        'layout': utils.events_layout(LEAGUE),
+        'database_bytes': os.path.getsize(database),
+        'events_bytes': events_bytes,
+        'ingest_seconds': ingest,
+        'events_scan': _measure(rescan, repeat),
+        'statistic_collector': _measure(lambda: utils.StatisticCollector()(LEAGUE), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--matches', type=int, default=380)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='soccer-schema-')
+    try:
+        data_dir = os.path.join(work_dir, 'data')
+        generate(data_dir, [LEAGUE], args.matches)
+        config.DATA_DIR = data_dir
+        import utils
+        database = os.path.join(work_dir, 'databases', 'soccer_data.sqlite')
+        results = {layout: measure_layout(utils, database, layout, args.repeat) for layout in ('wide', 'compact')}
+        utils.db_pool.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    results['matches'] = args.matches
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
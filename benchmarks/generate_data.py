@@ -0,0 +1,111 @@
+"""Writes synthetic Wyscout-shaped parquet files (teams_*, events_*, players) for benchmarks.
+
+    python -m benchmarks.generate_data --out /tmp/soccer --matches 380 england france
+
+--matches is the scale factor per league: 1 is a single match, 380 a full season
+of a 20-team league, 1140 three seasons.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+TEAMS_PER_LEAGUE = 20
+PLAYERS_PER_TEAM = 25
+EVENTS_PER_MATCH = 1700
+HALF_SECONDS = 2900
+# Approximate share of each event type in the Wyscout dataset.
+EVENT_NAMES = ['Pass', 'Duel', 'Others on the ball', 'Free Kick', 'Interruption', 'Foul', 'Shot',
+               'Save attempt', 'Offside', 'Goalkeeper leaving line']
+EVENT_SHARES = [0.50, 0.28, 0.07, 0.05, 0.04, 0.025, 0.015, 0.01, 0.005, 0.005]
+ACCURACY = {'Pass': 0.82, 'Shot': 0.35}
+GOAL_SHARE = 0.11
+ASSIST_SHARE = 0.007
+KEY_PASS_SHARE = 0.02
+
+
+def _teams(league_index, rng):
+    team_ids = np.arange(TEAMS_PER_LEAGUE) + 1000 * (league_index + 1)
+    points = np.sort(rng.integers(20, 100, TEAMS_PER_LEAGUE))[::-1]
+    goals_diff = np.sort(rng.integers(-40, 60, TEAMS_PER_LEAGUE))[::-1]
+    return pd.DataFrame({
+        'teamId': team_ids,
+        'teamName': [f'Team {team_id}' for team_id in team_ids],
+        'position': np.arange(1, TEAMS_PER_LEAGUE + 1),
+        'goals': rng.integers(25, 95, TEAMS_PER_LEAGUE),
+        'points': points,
+        'goalsDiff': goals_diff,
+    })
+
+
+def _players(team_ids):
+    player_ids = np.arange(len(team_ids) * PLAYERS_PER_TEAM) + team_ids.min() * 100
+    return pd.DataFrame({
+        'playerId': player_ids,
+        'playerStrongFoot': np.where(player_ids % 4 == 0, 'left', 'right'),
+        'playerName': [f'Player {player_id}' for player_id in player_ids],
+        'playerPosition': np.array(['GK', 'DF', 'MF', 'FW'])[player_ids % 4],
+    })
+
+
+def _events(league_index, team_ids, matches, rng):
+    events_amount = matches * EVENTS_PER_MATCH
+    match_index = np.repeat(np.arange(matches), EVENTS_PER_MATCH)
+    home = rng.integers(0, TEAMS_PER_LEAGUE, matches)
+    away = (home + rng.integers(1, TEAMS_PER_LEAGUE, matches)) % TEAMS_PER_LEAGUE
+    is_home = rng.random(events_amount) < 0.5
+    team_index = np.where(is_home, home[match_index], away[match_index])
+    player_index = team_index * PLAYERS_PER_TEAM + rng.integers(0, PLAYERS_PER_TEAM, events_amount)
+    player_ids = player_index + team_ids.min() * 100
+    # eventSec restarts with the second half, as in the Wyscout export.
+    position_in_match = np.tile(np.arange(EVENTS_PER_MATCH), matches)
+    half_length = EVENTS_PER_MATCH // 2
+    event_sec = (position_in_match % half_length) * (HALF_SECONDS / half_length) + rng.random(events_amount)
+    event_names = rng.choice(EVENT_NAMES, events_amount, p=EVENT_SHARES)
+    is_pass = event_names == 'Pass'
+    is_shot = event_names == 'Shot'
+    accurate = np.zeros(events_amount, dtype=bool)
+    accurate[is_pass] = rng.random(is_pass.sum()) < ACCURACY['Pass']
+    accurate[is_shot] = rng.random(is_shot.sum()) < ACCURACY['Shot']
+    return pd.DataFrame({
+        'id': np.arange(events_amount, dtype=np.int64) + (league_index + 1) * 10 ** 9,
+        'matchId': match_index + (league_index + 1) * 10 ** 6,
+        'eventSec': event_sec,
+        'eventName': event_names,
+        'teamId': team_ids[team_index],
+        'playerId': player_ids,
+        'playerName': pd.Series(player_ids).map(lambda player_id: f'Player {player_id}').values,
+        'accurate': accurate,
+        'goal': is_shot & (rng.random(events_amount) < GOAL_SHARE),
+        'assist': is_pass & (rng.random(events_amount) < ASSIST_SHARE),
+        'keyPass': is_pass & (rng.random(events_amount) < KEY_PASS_SHARE),
+    })
+
+
+def generate(out_dir, leagues, matches, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    players = []
+    for league_index, league in enumerate(leagues):
+        teams = _teams(league_index, rng)
+        teams.to_parquet(os.path.join(out_dir, f'teams_{league}.parquet'), index=False)
+        _events(league_index, teams.teamId.values, matches, rng).to_parquet(
+            os.path.join(out_dir, f'events_{league}.parquet'), index=False)
+        players.append(_players(teams.teamId.values))
+    pd.concat(players).to_parquet(os.path.join(out_dir, 'players.parquet'), index=False)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('leagues', nargs='*', default=['england', 'france', 'spain', 'germany', 'italy'])
+    parser.add_argument('--out', default='data/event_data', help='output directory')
+    parser.add_argument('--matches', type=int, default=380, help='matches per league (scale factor)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out, args.leagues, args.matches, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""Replays concurrent browser sessions against the dashboard's callback endpoint.
+
+    python -m benchmarks.load_test --serve --matches 38 --users 8 --duration 60 --scenario cold
+    python -m benchmarks.load_test --url http://127.0.0.1:8050 --users 16 --scenario warm --output load.json
+
+Every simulated user opens the landing page (/, /_dash-layout, /_dash-dependencies), then the
+Teams and Players pages, and clicks through the league tabs in a random order. Each click is
+posted to /_dash-update-component with the same multi-output payload the browser sends, and
+the job interval is polled every --poll-interval ms while a league is still loading.
+
+--serve starts index.app.server in this process on a threaded server, with synthetic data
+(benchmarks.generate_data) and an empty database, so the cold scenario starts with nothing
+loaded. --scenario warm first walks every tab once until it is ready and only then starts
+measuring. Reports requests, errors, throughput and p50/p95/p99 latency per callback, plus
+'tab_ready' (click to rendered content, polls included).
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import config
+from benchmarks.generate_data import generate
+
+LEAGUE_TABS = ['tab-1', 'tab-2', 'tab-3', 'tab-4', 'tab-5']
+# Page, main content component and job interval of the two per-league pages.
+PAGES = {
+    'app1': ('/apps/app1', 'indicator-graphic-teams', 'teams-job-interval'),
+    'app2': ('/apps/app2', 'indicator-graphic-players', 'players-job-interval'),
+}
+PERCENTILES = (50, 95, 99)
+
+
+def _callback_payload(outputs, inputs, changed, state=()):
+    # Dash's request body: one "..id.prop...id.prop.." key for multi-output callbacks.
+    output_ids = [{'id': component, 'property': prop} for component, prop in outputs]
+    return {
+        'output': '..' + '...'.join(f'{component}.{prop}' for component, prop in outputs) + '..'
+        if len(outputs) > 1 else f'{outputs[0][0]}.{outputs[0][1]}',
+        'outputs': output_ids if len(outputs) > 1 else output_ids[0],
+        'inputs': [{'id': component, 'property': prop, 'value': value} for component, prop, value in inputs],
+        'state': [{'id': component, 'property': prop, 'value': value} for component, prop, value in state],
+        'changedPropIds': [f'{component}.{prop}' for component, prop in changed],
+    }
+
+
+def display_page_payload(pathname):
+    return _callback_payload([('page-content', 'children')], [('url', 'pathname', pathname)],
+                             [('url', 'pathname')])
+
+
+def render_content_payload(page, tab, n_intervals=None):
+    _, content, interval = PAGES[page]
+    changed = ('tabs-example', 'value') if n_intervals is None else (interval, 'n_intervals')
+    return _callback_payload([(content, 'children'), (interval, 'disabled')],
+                             [('tabs-example', 'value', tab), (interval, 'n_intervals', n_intervals)], [changed])
+
+
+def timeline_teams_payload(tab, job_done):
+    return _callback_payload([('timeline-team', 'options'), ('timeline-team', 'value')],
+                             [('tabs-example', 'value', tab), ('teams-job-interval', 'disabled', job_done)],
+                             [('tabs-example', 'value')])
+
+
+def _load_failed(response, page):
+    # A failed league job renders loading_placeholder's danger alert, which also stops the polling.
+    content = response['response'][PAGES[page][1]]['children']
+    return isinstance(content, dict) and content.get('type') == 'Alert' and \
+        content.get('props', {}).get('color') == 'danger'
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sessions = 0
+
+    def record(self, name, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies[name].append(seconds)
+            else:
+                self.errors[name] += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def report(self, elapsed):
+        results = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            timings = sorted(self.latencies[name])
+            results[name] = {
+                'requests': len(timings),
+                'errors': self.errors[name],
+                'throughput': len(timings) / elapsed,
+                **{f'p{percentile}': _percentile(timings, percentile) for percentile in PERCENTILES},
+                'max': timings[-1] if timings else None,
+            }
+        return results
+
+
+def _percentile(timings, percentile):
+    if not timings:
+        return None
+    return timings[min(len(timings) - 1, int(len(timings) * percentile / 100))]
+
+
+class Session:
+    """One simulated user with its own keep-alive connection, like a browser tab."""
+
+    def __init__(self, url, recorder, poll_interval, timeout, rng):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.rng = rng
+        self._connection = None
+
+    def _request(self, name, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        started = time.perf_counter()
+        try:
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._connection.request(method, path, body=payload, headers=headers)
+            response = self._connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.recorder.record(name, time.perf_counter() - started, ok=False)
+            self.close()
+            return None
+        elapsed = time.perf_counter() - started
+        ok = response.status in (200, 204)
+        self.recorder.record(name, elapsed, ok=ok)
+        return json.loads(content) if ok and method == 'POST' and response.status == 200 else None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def landing(self):
+        for name, path in (('landing', '/'), ('dash_layout', '/_dash-layout'),
+                           ('dash_dependencies', '/_dash-dependencies')):
+            self._request(name, 'GET', path)
+        self._request('index.display_page', 'POST', '/_dash-update-component', display_page_payload('/'))
+
+    def click_tab(self, page, tab):
+        started = time.perf_counter()
+        name = f'{page}.render_content'
+        response = self._request(name, 'POST', '/_dash-update-component', render_content_payload(page, tab))
+        n_intervals = 0
+        # The page keeps polling through its dcc.Interval until the league job is done.
+        while response is not None and not response['response'][PAGES[page][2]]['disabled']:
+            time.sleep(self.poll_interval)
+            n_intervals += 1
+            response = self._request(f'{name}.poll', 'POST', '/_dash-update-component',
+                                     render_content_payload(page, tab, n_intervals))
+        if response is None:
+            return False
+        if _load_failed(response, page):
+            self.recorder.record(f'{page}.tab_ready', time.perf_counter() - started, ok=False)
+            return False
+        self.recorder.record(f'{page}.tab_ready', time.perf_counter() - started)
+        if page == 'app1':
+            self._request('app1.update_timeline_teams', 'POST', '/_dash-update-component',
+                          timeline_teams_payload(tab, True))
+        return True
+
+    def browse(self):
+        self.landing()
+        for page, (pathname, _, _) in PAGES.items():
+            self._request('index.display_page', 'POST', '/_dash-update-component', display_page_payload(pathname))
+            for tab in self.rng.sample(LEAGUE_TABS, len(LEAGUE_TABS)):
+                self.click_tab(page, tab)
+
+
+def warm_up(url, poll_interval, timeout):
+    session = Session(url, Recorder(), poll_interval, timeout, random.Random(0))
+    for page in PAGES:
+        for tab in LEAGUE_TABS:
+            if not session.click_tab(page, tab):
+                raise RuntimeError(f'Warm-up of {page} {tab} failed')
+    session.close()
+
+
+def run(url, users, duration, sessions, poll_interval, timeout, seed):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def user(index):
+        session = Session(url, recorder, poll_interval, timeout, random.Random(seed + index))
+        completed = 0
+        while (sessions is None or completed < sessions) and (deadline is None or time.perf_counter() < deadline):
+            session.browse()
+            completed += 1
+            recorder.session_done()
+        session.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(index,), name=f'load-user-{index}') for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return elapsed, recorder.sessions, recorder.report(elapsed)
+
+
+def serve(work_dir, matches):
+    # Synthetic five-league dataset and an empty database: nothing is loaded or cached yet.
+    from werkzeug.serving import make_server
+    data_dir = os.path.join(work_dir, 'data')
+    generate(data_dir, ['england', 'france', 'spain', 'germany', 'italy'], matches)
+    config.DATA_DIR = data_dir
+    import utils
+    utils.configure_db_pool(os.path.join(work_dir, 'databases', 'soccer_data.sqlite'))
+    import index
+    server = make_server('127.0.0.1', 0, index.app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def print_report(report):
+    print(f"{report['scenario']} scenario, {report['users']} users, {report['sessions']} sessions, "
+          f"{report['elapsed_seconds']:.1f}s: "
+          f"{report['total_requests']} requests, {report['throughput']:.1f} req/s")
+    print(f"{'callback':<34} {'requests':>8} {'errors':>6} {'req/s':>7} "
+          + ' '.join(f'{f"p{percentile} ms":>9}' for percentile in PERCENTILES))
+    for name, result in report['results'].items():
+        latencies = ' '.join(f'{result[f"p{percentile}"] * 1000:9.1f}' if result[f'p{percentile}'] is not None
+                             else f'{"-":>9}' for percentile in PERCENTILES)
+        print(f"{name:<34} {result['requests']:8d} {result['errors']:6d} {result['throughput']:7.1f} {latencies}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base URL of a running server, e.g. http://127.0.0.1:8050')
+    target.add_argument('--serve', action='store_true', help='start the app in this process on synthetic data')
+    parser.add_argument('--matches', type=int, default=38, help='matches per synthetic league (with --serve)')
+    parser.add_argument('--scenario', choices=('cold', 'warm'), default='warm')
+    parser.add_argument('--users', type=int, default=4, help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run (0: until --sessions)')
+    parser.add_argument('--sessions', type=int, help='sessions per user before it stops')
+    parser.add_argument('--poll-interval', type=float, default=config.JOB_POLL_INTERVAL_MS,
+                        help='ms between job interval polls')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a request counts as failed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+    if not args.duration and args.sessions is None:
+        parser.error('--duration 0 needs --sessions')
+
+    work_dir = tempfile.mkdtemp(prefix='soccer-load-') if args.serve else None
+    server = None
+    try:
+        if args.serve:
+            server, url = serve(work_dir, args.matches)
+        else:
+            url = args.url
+        poll_interval = args.poll_interval / 1000
+        if args.scenario == 'warm':
+            warm_up(url, poll_interval, args.timeout)
+        elapsed, sessions, results = run(url, args.users, args.duration, args.sessions, poll_interval, args.timeout, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # tab_ready spans several requests, so it is left out of the totals.
+    total = sum(result['requests'] for name, result in results.items() if not name.endswith('.tab_ready'))
+    report = {
+        'url': 'in-process' if args.serve else url,
+        'scenario': args.scenario,
+        'users': args.users,
+        'sessions': sessions,
+        'elapsed_seconds': elapsed,
+        'total_requests': total,
+        'throughput': total / elapsed,
+        'results': results,
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
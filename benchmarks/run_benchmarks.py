@@ -0,0 +1,129 @@
+"""Benchmarks Loader, StatisticCollector and both render_content callbacks on synthetic data.
+
+    python -m benchmarks.run_benchmarks --matches 380 --output bench.json
+    python -m benchmarks.run_benchmarks --compare bench.json
+
+Results are written as JSON. With --compare the run fails (exit code 1) when a
+benchmark's median is slower than the baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+
+import config
+from benchmarks.generate_data import generate
+
+LEAGUE = 'england'
+TAB = 'tab-1'
+
+
+def _measure(function, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {'repeat': repeat, 'min': min(timings), 'median': statistics.median(timings), 'max': max(timings)}
+
+
+def run(work_dir, matches, repeat):
+    data_dir = os.path.join(work_dir, 'data')
+    database = os.path.join(work_dir, 'databases', 'soccer_data.sqlite')
+    generate(data_dir, [LEAGUE], matches)
+    config.DATA_DIR = data_dir
+
+    import utils
+    from app import get_registry, get_figure_cache
+    registry, figure_cache = get_registry(), get_figure_cache()
+    from apps import app1, app2
+
+    def fresh_database():
+        utils.configure_db_pool(database)
+        shutil.rmtree(os.path.dirname(database), ignore_errors=True)
+
+    def reset_caches():
+        registry.loader.cache.clear()
+        registry.statistic_collector.cache.clear()
+        figure_cache.clear()
+
+    results = {
+        'loader_cold': _measure(lambda: utils.Loader()(LEAGUE), repeat, setup=fresh_database),
+        'loader_warm': _measure(lambda: utils.Loader()(LEAGUE), repeat),
+        'statistic_collector': _measure(lambda: utils.StatisticCollector()(LEAGUE), repeat),
+    }
+    registry.statistic(LEAGUE)
+    for name, page in (('app1', app1), ('app2', app2)):
+        results[f'render_{name}_cold'] = _measure(lambda: page.cached_content(LEAGUE), repeat,
+                                                  setup=figure_cache.clear)
+        results[f'render_{name}_warm'] = _measure(lambda: page.render_content(TAB), repeat)
+    reset_caches()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['median'] / baseline[name]['median'] if baseline[name]['median'] else 1.0
+        print(f'{name:24} {baseline[name]["median"]:10.4f}s -> {result["median"]:10.4f}s  x{ratio:.2f}')
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matches', type=int, default=38, help='matches in the synthetic league')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='soccer-bench-')
+    try:
+        results = run(work_dir, args.matches, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        'created_at': dt.now().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'backend': config.STORAGE_BACKEND,
+        'matches': args.matches,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.tolerance)
+        if regressions:
+            print(f'Regressions: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Breaks down the import cost of the dashboard's entry point.
+
+    python -m benchmarks.startup_report
+    python -m benchmarks.startup_report --module index --top 15 --output startup.json
+
+Imports the module in a fresh interpreter with `python -X importtime` and reports the
+total, the cumulative cost of every top-level package and the slowest single modules.
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$')
+
+
+def measure(module):
+    started = 'import time, sys; started = time.perf_counter(); ' \
+              f'import {module}; sys.stdout.write(str(time.perf_counter() - started))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', started],
+                             capture_output=True, text=True, check=True)
+    modules = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({'module': name, 'self_ms': int(self_us) / 1000,
+                            'cumulative_ms': int(cumulative_us) / 1000, 'depth': len(indent) // 2})
+    return float(process.stdout.strip().splitlines()[-1]), modules
+
+
+def summarize(module, total_seconds, modules, top):
+    # A package's cost is the sum of its modules' own time, wherever they were first imported from.
+    packages = defaultdict(float)
+    for entry in modules:
+        packages[entry['module'].split('.')[0]] += entry['self_ms']
+    return {
+        'module': module,
+        'total_ms': total_seconds * 1000,
+        'packages': dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+        'slowest_modules': sorted(({'module': entry['module'], 'self_ms': entry['self_ms']} for entry in modules),
+                                  key=lambda entry: -entry['self_ms'])[:top],
+        'loaded_modules': [entry['module'] for entry in modules],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='index', help='module to import (default: index)')
+    parser.add_argument('--top', type=int, default=15, help='packages/modules to list')
+    parser.add_argument('--output', help='write the full report to this JSON file')
+    args = parser.parse_args()
+
+    report = summarize(args.module, *measure(args.module), top=args.top)
+    print(f"import {report['module']}: {report['total_ms']:.0f} ms, {len(report['loaded_modules'])} modules")
+    print('by package (self time):')
+    for package, elapsed in report['packages'].items():
+        print(f'  {package:<32} {elapsed:8.1f} ms')
+    print('slowest modules:')
+    for entry in report['slowest_modules']:
+        print(f"  {entry['module']:<48} {entry['self_ms']:8.1f} ms")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import os
+
+
+def _env_flag(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Bulk ingest: rows per executemany() call and SQLite page cache (KiB) used while loading.
+INGEST_BATCH_SIZE = int(os.environ.get('SOCCER_INGEST_BATCH_SIZE', 50000))
+INGEST_CACHE_SIZE_KB = int(os.environ.get('SOCCER_INGEST_CACHE_SIZE_KB', 200000))
+# Append only the matches an updated events file adds to an already loaded league (matchIds
+# already present are skipped, not re-read; a changed file that adds no match rebuilds the
+# league's events); off re-inserts the whole file.
+INGEST_INCREMENTAL = _env_flag('SOCCER_INGEST_INCREMENTAL', True)
+
+# SQLite database shared by the ingest and query paths.
+DB_PATH = os.environ.get('SOCCER_DB_PATH', 'databases/soccer_data.sqlite')
+# Read-only connections kept open for the query helpers in utils.py.
+DB_POOL_SIZE = int(os.environ.get('SOCCER_DB_POOL_SIZE', 4))
+# Seconds a connection waits on a locked database before raising "database is locked".
+DB_BUSY_TIMEOUT = float(os.environ.get('SOCCER_DB_BUSY_TIMEOUT', 30))
+
+# Directory holding the Wyscout parquet exports (teams_*, events_*, players).
+DATA_DIR = os.environ.get('SOCCER_DATA_DIR', 'data/event_data')
+# 'sqlite' ingests parquet into DB_PATH and queries it; 'parquet' aggregates the files directly.
+STORAGE_BACKEND = os.environ.get('SOCCER_STORAGE_BACKEND', 'sqlite')
+
+# Rendered page contents kept by utils.FigureCache (one entry per page, league and data version).
+FIGURE_CACHE_SIZE = int(os.environ.get('SOCCER_FIGURE_CACHE_SIZE', 20))
+# StatisticCollector results: max leagues, max estimated DataFrame memory (MiB) and seconds an
+# entry stays valid; 0 disables a bound.
+STATISTIC_CACHE_SIZE = int(os.environ.get('SOCCER_STATISTIC_CACHE_SIZE', 10))
+STATISTIC_CACHE_MAX_MB = float(os.environ.get('SOCCER_STATISTIC_CACHE_MAX_MB', 256))
+STATISTIC_CACHE_TTL = float(os.environ.get('SOCCER_STATISTIC_CACHE_TTL', 0))
+# Directory where StatisticCollector results are shared between server worker processes
+# (e.g. gunicorn workers) as parquet files; empty disables the shared cache.
+SHARED_CACHE_DIR = os.environ.get('SOCCER_SHARED_CACHE_DIR', '')
+
+# Load, compute and render every league in the background when the server starts.
+WARMUP_ENABLED = _env_flag('SOCCER_WARMUP')
+WARMUP_WORKERS = int(os.environ.get('SOCCER_WARMUP_WORKERS', 5))
+
+# Every competition the Wyscout dataset ships; the default set for ingest.py.
+INGEST_LEAGUES = os.environ.get(
+    'SOCCER_INGEST_LEAGUES', 'england,france,spain,germany,italy,World_Cup,European_Championship').split(',')
+# Worker processes for ingest.py / utils.ingest_leagues (None = one per core).
+INGEST_WORKERS = int(os.environ['SOCCER_INGEST_WORKERS']) if os.environ.get('SOCCER_INGEST_WORKERS') else None
+
+# Background threads that load/compute cold leagues for the page callbacks.
+JOB_WORKERS = int(os.environ.get('SOCCER_JOB_WORKERS', 2))
+# How often (ms) a page polls a running league job.
+JOB_POLL_INTERVAL_MS = int(os.environ.get('SOCCER_JOB_POLL_INTERVAL_MS', 1000))
+
+# Hot-path timing histograms served on /metrics; when off, instrumentation is a no-op.
+METRICS_ENABLED = _env_flag('SOCCER_METRICS', True)
+
+# Opt-in profiling of the page callbacks: a request is profiled when it sends PROFILE_HEADER: 1,
+# its page URL has ?profile=1, or it is picked at PROFILE_SAMPLE_RATE (0..1). Stacks are sampled
+# every PROFILE_INTERVAL_MS and written to PROFILE_DIR. When off, callbacks are not wrapped at all.
+PROFILE_ENABLED = _env_flag('SOCCER_PROFILE')
+PROFILE_DIR = os.environ.get('SOCCER_PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('SOCCER_PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('SOCCER_PROFILE_INTERVAL_MS', 5))
+PROFILE_HEADER = os.environ.get('SOCCER_PROFILE_HEADER', 'X-Soccer-Profile')
+PROFILE_PARAM = 'profile'
+
+# Layout of newly created {league}_events tables: 'wide' (one TEXT/BOOLEAN column per field) or
+# 'compact' (event type id + packed flags). Existing tables keep theirs until migrated.
+EVENTS_SCHEMA = os.environ.get('SOCCER_EVENTS_SCHEMA', 'wide')
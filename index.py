@@ -3,8 +3,11 @@ import dash_html_components as html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 
-from app import app
-from apps import app1, app2
+import config
+import metrics
+import warmup
+from app import app, get_registry, get_figure_cache
+from apps import app1, app2, app3
 
 app.layout = html.Div(children=[
     dcc.Location(id='url', refresh=False),
@@ -76,6 +79,7 @@ third_card = dbc.Card(
                 html.Ol(children=[
                     html.Li('To see data about teams choose "Team Analysis" in Navigation Menu.'),
                     html.Li('To see data about players choose "Player Analysis" in Navigation Menu.'),
+                    html.Li('To compare leagues choose "Leagues Comparison" in Navigation Menu.'),
                 ]),
             ]
         ),
@@ -115,6 +119,7 @@ index_page = html.Div(children=[
         children=[
             dbc.NavItem(dbc.NavLink("Team Analysis", href='/apps/app1')),
             dbc.NavItem(dbc.NavLink("Player Analysis", href='/apps/app2')),
+            dbc.NavItem(dbc.NavLink("Leagues Comparison", href='/apps/app3')),
         ],
         brand="Soccer Analysis",
         brand_href="/",
@@ -141,9 +146,31 @@ def display_page(pathname):
         return app1.layout
     elif pathname == '/apps/app2':
         return app2.layout
+    elif pathname == '/apps/app3':
+        return app3.layout
     else:
         return index_page
 
 
+startup_warmup = warmup.Warmup([app1, app2]).start() if config.WARMUP_ENABLED else None
+warmup.register_ready_route(app.server, startup_warmup)
+
+
+def cache_gauges():
+    registry, figure_cache = get_registry(), get_figure_cache()
+    shared_cache = registry.statistic_collector.shared_cache
+    return {
+        **{f'soccer_registry_{name}_total': value for name, value in registry.stats.items()},
+        **{f'soccer_statistic_cache_{name}': value
+           for name, value in registry.statistic_collector.cache.stats.items()},
+        **{f'soccer_figure_cache_{name}': value for name, value in figure_cache.stats.items()},
+        **({f'soccer_shared_cache_{name}_total': value for name, value in shared_cache.stats.items()}
+           if shared_cache is not None else {}),
+    }
+
+
+metrics.register_metrics_route(app.server, gauges=cache_gauges)
+
+
 if __name__ == '__main__':
     app.run_server(debug=True)
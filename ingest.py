@@ -0,0 +1,27 @@
+import argparse
+
+import config
+import utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load Wyscout parquet exports into the SQLite database '
+                                                 'using one worker process per league.')
+    parser.add_argument('leagues', nargs='*', default=config.INGEST_LEAGUES,
+                        help='leagues to ingest (default: every competition in the dataset)')
+    parser.add_argument('--workers', type=int, default=config.INGEST_WORKERS,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-ingest leagues the manifest already marks as loaded')
+    parser.add_argument('--migrate-schema', choices=('wide', 'compact'),
+                        help='rewrite already loaded events tables into this layout instead of ingesting')
+    args = parser.parse_args()
+    if args.migrate_schema:
+        for league in args.leagues:
+            utils.migrate_events_schema(league, args.migrate_schema)
+        return
+    utils.ingest_leagues(args.leagues, workers=args.workers, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+import flask
+
+import config
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed label set."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+
+stage_duration = Histogram('soccer_stage_duration_seconds',
+                           'Time spent in instrumented hot-path stages.', ('stage', 'league'))
+
+
+class _Timer:
+    __slots__ = ('stage', 'league', 'started')
+
+    def __init__(self, stage, league):
+        self.stage = stage
+        self.league = league
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stage_duration.observe(time.perf_counter() - self.started, self.stage, self.league)
+        return False
+
+
+def timed(stage, league=''):
+    if not config.METRICS_ENABLED:
+        return _NOOP
+    return _Timer(stage, league)
+
+
+def observe(stage, seconds, league=''):
+    if config.METRICS_ENABLED:
+        stage_duration.observe(seconds, stage, league)
+
+
+def instrument(stage):
+    # Decorator variant of timed(); returns the function untouched when metrics are off.
+    def decorate(function):
+        if not config.METRICS_ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage, ''):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_metrics_route(server, gauges=None):
+    # gauges: callable returning {metric name: value} sampled on every scrape (cache hit counters etc).
+    if not config.METRICS_ENABLED:
+        return
+
+    @server.before_request
+    def _start_dash_timer():
+        if flask.request.path == '/_dash-update-component':
+            flask.g.metrics_started = time.perf_counter()
+
+    @server.after_request
+    def _observe_dash_request(response):
+        started = flask.g.pop('metrics_started', None)
+        if started is not None:
+            # Callback body plus Dash's JSON serialization of the outputs.
+            stage_duration.observe(time.perf_counter() - started, 'dash_update_component', '')
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        lines = stage_duration.render()
+        for name, value in sorted((gauges() if gauges else {}).items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return flask.Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,129 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import config
+import timeline
+
+# Decoded teams/players frames keyed by (path, mtime); both files are tiny and read on every query.
+_frames_cache = {}
+# Timeline cubes keyed by (events path, mtime).
+_cubes_cache = {}
+
+
+def _events_path(league):
+    return os.path.join(config.DATA_DIR, f"events_{league}.parquet")
+
+
+def _teams_path(league):
+    return os.path.join(config.DATA_DIR, f"teams_{league}.parquet")
+
+
+def _players_path():
+    return os.path.join(config.DATA_DIR, "players.parquet")
+
+
+def _read_frame(path, columns):
+    mtime = os.stat(path).st_mtime
+    key = (path, mtime, tuple(columns))
+    if key not in _frames_cache:
+        for stale_key in [cached_key for cached_key in _frames_cache if cached_key[0] == path and cached_key[1] != mtime]:
+            del _frames_cache[stale_key]
+        _frames_cache[key] = ds.dataset(path, format='parquet').to_table(columns=columns).to_pandas()
+    return _frames_cache[key]
+
+
+def _flag_is_set(dataset, column):
+    is_boolean = pa.types.is_boolean(dataset.schema.field(column).type)
+    return ds.field(column) == (True if is_boolean else 1)
+
+
+def _read_events(league, columns, event_name, flag):
+    # Only the projected columns of the matching rows are decoded; the filter is pushed into the scan.
+    dataset = ds.dataset(_events_path(league), format='parquet')
+    condition = (ds.field('eventName') == event_name) & _flag_is_set(dataset, flag)
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def _teams(league):
+    teams = _read_frame(_teams_path(league), ['teamId', 'teamName', 'position', 'points', 'goals'])
+    return teams.rename(columns={'teamId': 'id', 'teamName': 'team_name'})
+
+
+def get_data_for_teams_graph(league):
+    teams = _teams(league).sort_values('position')
+    return teams[['team_name', 'position', 'points', 'goals']].reset_index(drop=True)
+
+
+def get_team_names(league):
+    teams = _teams(league)
+    return dict(zip(teams.id, teams.team_name))
+
+
+def team_metric_totals(league, metrics):
+    # Single projected scan of the league; each metric is a masked sum over the same frame.
+    flags = sorted({metric[4] for metric in metrics})
+    dataset = ds.dataset(_events_path(league), format='parquet')
+    events = dataset.to_table(columns=['eventName', 'teamId', 'matchId'] + flags).to_pandas()
+    totals = pd.DataFrame({'teamId': events.teamId})
+    for amount_column, _, _, event_name, flag in metrics:
+        totals[amount_column] = ((events.eventName == event_name) & (events[flag] == 1)).astype('int64')
+    totals = totals.groupby('teamId').sum()
+    totals['match_amount'] = events.groupby('teamId').matchId.nunique()
+    data = _teams(league).merge(totals, left_on='id', right_index=True)
+    return data[['id', 'position', 'points', 'goals', 'team_name'] +
+                [metric[0] for metric in metrics] + ['match_amount']].reset_index(drop=True)
+
+
+def _best_players(league, event_name, flag, amount_column, limit=20):
+    events = _read_events(league, ['playerId', 'teamId'], event_name, flag)
+    totals = events.groupby('playerId').agg(**{amount_column: ('teamId', 'size'), 'team_id': ('teamId', 'max')})
+    players = _read_frame(_players_path(), ['playerId', 'playerName'])
+    data = players.merge(totals, left_on='playerId', right_index=True)
+    data = data.rename(columns={'playerId': 'player_id', 'playerName': 'player_name'})
+    data = data.sort_values(amount_column, ascending=False, kind='mergesort').head(limit)
+    data = data[['player_id', 'player_name', amount_column, 'team_id']].reset_index(drop=True)
+    data['team_name'] = data.team_id.map(get_team_names(league))
+    return data
+
+
+def get_best_scorers_data(league):
+    return _best_players(league, 'Shot', 'goal', 'goals_amount')
+
+
+def get_best_assistants_data(league):
+    return _best_players(league, 'Pass', 'assist', 'assist_amount')
+
+
+def get_leaderboard(leagues, kind='scorers', limit=20):
+    # The overall top `limit` is contained in the union of every league's top `limit`.
+    event_name, flag, amount_column = {'scorers': ('Shot', 'goal', 'goals_amount'),
+                                       'assistants': ('Pass', 'assist', 'assist_amount')}[kind]
+    frames = [_best_players(league, event_name, flag, amount_column, limit).assign(league=league)
+              for league in leagues]
+    # Ties are broken by league and player, as in the sqlite backend.
+    data = pd.concat(frames).sort_values([amount_column, 'league', 'player_id'],
+                                         ascending=[False, True, True]).head(limit)
+    return data[['league', 'player_id', 'player_name', amount_column, 'team_id', 'team_name']].reset_index(drop=True)
+
+
+def team_comparison_totals(leagues, metrics):
+    frames = [team_metric_totals(league, metrics).assign(league=league) for league in leagues]
+    data = pd.concat(frames)
+    return data[['league', 'id', 'position', 'points', 'goals', 'team_name'] +
+                [metric[0] for metric in metrics] + ['match_amount']].reset_index(drop=True)
+
+
+def get_timeline_cube(league):
+    path = _events_path(league)
+    key = (path, os.stat(path).st_mtime)
+    if key not in _cubes_cache:
+        events = ds.dataset(path, format='parquet').to_table(columns=timeline.EVENT_COLUMNS).to_pandas()
+        for flag in ('accurate', 'goal'):
+            events[flag] = (events[flag] == 1).astype('int64')
+        for stale_key in [cached_key for cached_key in _cubes_cache if cached_key[0] == path]:
+            del _cubes_cache[stale_key]
+        _cubes_cache[key] = timeline.TimelineCube.from_events(events)
+    return _cubes_cache[key]
@@ -0,0 +1,192 @@
+import itertools
+import json
+import linecache
+import logging as logger
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from urllib.parse import parse_qs, urlsplit
+
+import flask
+
+import config
+
+# Checked from the innermost frame outwards; the first module prefix that matches wins.
+MODULE_CATEGORIES = (
+    (('pandas.io.sql', 'sqlite3'), 'sql'),
+    (('plotly', '_plotly_utils'), 'plotly'),
+    (('pandas', 'numpy', 'pyarrow'), 'pandas'),
+)
+# Samples under these functions that are none of the above count as 'loader'.
+LOADER_FUNCTIONS = {('utils', 'Loader.__call__'), ('utils', 'ingest_source'), ('utils', 'ingest_leagues')}
+# sqlite3 runs in C, so a sample taken inside it ends in the Python line that called it.
+SQL_CALL = re.compile(r'\.(execute|executemany|executescript|fetchall|fetchone|fetchmany)\(')
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+_local = threading.local()
+_sequence = itertools.count()
+
+
+def _trigger():
+    if config.PROFILE_SAMPLE_RATE and random.random() < config.PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    if not flask.has_request_context():
+        return None
+    request = flask.request
+    if request.headers.get(config.PROFILE_HEADER, '').lower() in TRUE_VALUES:
+        return 'header'
+    # Callback requests carry no query string of their own; the page URL comes in the Referer.
+    referrer = request.headers.get('Referer', '')
+    values = request.args.getlist(config.PROFILE_PARAM) or \
+        (parse_qs(urlsplit(referrer).query).get(config.PROFILE_PARAM, []) if config.PROFILE_PARAM in referrer else [])
+    if any(value.lower() in TRUE_VALUES for value in values):
+        return 'query'
+    return None
+
+
+def _qualname(frame):
+    # code.co_qualname only exists from Python 3.11; before that the class is taken from self/cls.
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname is not None:
+        return qualname
+    if code.co_argcount and code.co_varnames[0] in ('self', 'cls'):
+        owner = frame.f_locals.get(code.co_varnames[0])
+        if owner is not None:
+            return f"{(owner if isinstance(owner, type) else type(owner)).__name__}.{code.co_name}"
+    return code.co_name
+
+
+def _frame_label(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{_qualname(frame)}"
+
+
+def _category(frames):
+    line = linecache.getline(frames[0].f_code.co_filename, frames[0].f_lineno)
+    if SQL_CALL.search(line):
+        return 'sql'
+    for frame in frames:
+        module = frame.f_globals.get('__name__', '')
+        for prefixes, category in MODULE_CATEGORIES:
+            if module.startswith(prefixes):
+                return category
+    if any((frame.f_globals.get('__name__'), _qualname(frame)) in LOADER_FUNCTIONS for frame in frames):
+        return 'loader'
+    return 'other'
+
+
+class Profile:
+    """Samples one thread's stack every PROFILE_INTERVAL_MS while it runs a profiled function.
+
+    Writes {stage}-....folded (collapsed stacks, one "frame;frame;... count" per line, for
+    flamegraph.pl / speedscope) and a .json summary with the time per category.
+    """
+
+    def __init__(self, stage, trigger, root_code, args=()):
+        self.stage = stage
+        self.trigger = trigger
+        self.root_code = root_code
+        self.args = args
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f'profile-{stage}', daemon=True)
+
+    def __enter__(self):
+        _local.profile = self
+        self.started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self._stop.set()
+        self._sampler.join()
+        _local.profile = None
+        try:
+            self.write(config.PROFILE_DIR)
+        except OSError:
+            logger.exception(f'  Could not write the {self.stage} profile')
+        return False
+
+    def _sample(self):
+        interval = config.PROFILE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+            # Innermost first, cut at the profiled function so web server frames are left out.
+            while frame is not None:
+                frames.append(frame)
+                if frame.f_code is self.root_code:
+                    break
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(_frame_label(frame) for frame in reversed(frames))] += 1
+                self.categories[_category(frames)] += 1
+            del frame, frames
+
+    def summary(self):
+        samples = sum(self.categories.values())
+        return {
+            'stage': self.stage,
+            'trigger': self.trigger,
+            'args': repr(self.args),
+            'wall_seconds': self.elapsed,
+            'samples': samples,
+            'interval_ms': config.PROFILE_INTERVAL_MS,
+            # Samples spread the measured wall time, so short calls are not rounded down to zero.
+            'categories': {category: self.elapsed * count / samples
+                           for category, count in self.categories.most_common()} if samples else {},
+        }
+
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        name = f"{self.stage}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}"
+        path = os.path.join(directory, name)
+        with open(f'{path}.folded', 'w') as output:
+            output.writelines(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+        summary = self.summary()
+        with open(f'{path}.json', 'w') as output:
+            json.dump(summary, output, indent=2)
+        logger.info(f'  Profiled {self.stage} ({self.trigger}, {self.elapsed * 1000:.0f} ms): '
+                    + ', '.join(f'{category} {seconds * 1000:.0f} ms'
+                                for category, seconds in summary['categories'].items()))
+        return path
+
+
+def profiled(stage):
+    # Profiles a callback when its request asks for it (header / query parameter) or is sampled;
+    # returns the function untouched when profiling is off.
+    def decorate(function):
+        if not config.PROFILE_ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            trigger = None if getattr(_local, 'profile', None) else _trigger()
+            if trigger is None:
+                return function(*args, **kwargs)
+            with Profile(stage, trigger, function.__code__, args):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def propagate(function, stage):
+    """function, profiled as well if it is handed to another thread by a profiled one."""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return function
+    root_code = getattr(function, '__func__', function).__code__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with Profile(stage, profile.trigger, root_code, args):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+import config
+import utils
+from benchmarks.generate_data import generate
+
+LEAGUE = 'england'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_result_cache_evicts_the_least_recently_used():
+    cache = utils.ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get('b', 'missing') == 'missing'
+    stats = cache.stats
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size'], stats['maxsize']) == (3, 1, 1, 2, 2)
+
+
+def test_result_cache_bounds_the_estimated_bytes():
+    cache = utils.ResultCache(max_bytes=100, sizeof=len)
+    cache.put('a', 'x' * 40)
+    cache.put('b', 'x' * 40)
+    cache.put('c', 'x' * 40)
+    assert 'a' not in cache and cache.stats['bytes'] == 80
+    # The newest entry is kept even on its own over the bound.
+    cache.put('d', 'x' * 500)
+    assert list(cache._entries) == ['d'] and cache.stats['bytes'] == 500
+    cache.put('d', 'x' * 10)
+    assert cache.stats['bytes'] == 10
+    assert cache.invalidate(lambda key: key == 'd') == 1 and cache.stats['bytes'] == 0
+
+
+def test_result_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(utils.time, 'monotonic', clock)
+    cache = utils.ResultCache(ttl=60)
+    cache.put('a', 1)
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats['expirations'] == 1 and cache.stats['size'] == 0
+
+
+def test_shared_cache_round_trip(tmp_path):
+    cache = utils.SharedResultCache(str(tmp_path))
+    result = (pd.DataFrame({'team': ['A', 'B'], 'passes': [10, 20]}), pd.DataFrame({'x': [1.5]}))
+    assert cache.load(LEAGUE, 'v1') is None
+    assert cache.store(LEAGUE, 'v1', result)
+    # A second writer of the same version loses the rename and keeps nothing half written.
+    assert not cache.store(LEAGUE, 'v1', result)
+    loaded = cache.load(LEAGUE, 'v1')
+    assert len(loaded) == 2 and all(frame.equals(expected) for frame, expected in zip(loaded, result))
+    assert cache.store(LEAGUE, 'v2', result[:1])
+    assert cache.load(LEAGUE, 'v1') is None and len(cache.load(LEAGUE, 'v2')) == 1
+    assert sorted(os.listdir(tmp_path / LEAGUE)) == ['v2']
+    (tmp_path / LEAGUE / 'v2' / 'meta.json').write_text('{"version": "v3"}')
+    assert cache.load(LEAGUE, 'v2') is None
+    assert cache.stats == {'hits': 2, 'misses': 3, 'writes': 2}
+
+
+def test_shared_cache_lock_is_exclusive(tmp_path):
+    cache = utils.SharedResultCache(str(tmp_path))
+    events = []
+    holding = threading.Event()
+
+    def contender():
+        holding.wait()
+        with cache.lock(LEAGUE):
+            events.append('contender')
+
+    thread = threading.Thread(target=contender)
+    thread.start()
+    with cache.lock(LEAGUE):
+        holding.set()
+        thread.join(0.2)
+        assert thread.is_alive()
+        events.append('holder')
+    thread.join(5)
+    assert events == ['holder', 'contender']
+    # Other leagues are not blocked.
+    with cache.lock(LEAGUE), cache.lock('france'):
+        pass
+
+
+@pytest.fixture
+def loaded_league(tmp_path, monkeypatch):
+    generate(str(tmp_path / 'data'), [LEAGUE], 1)
+    monkeypatch.setattr(config, 'DATA_DIR', str(tmp_path / 'data'))
+    database = tmp_path / 'soccer_data.sqlite'
+    utils.configure_db_pool(str(database))
+    utils.Loader()(LEAGUE)
+    yield database
+    utils.db_pool.close()
+
+
+def test_team_names_follow_the_data_version(loaded_league):
+    team_names = utils.get_team_names(LEAGUE)
+    assert utils.get_team_names(LEAGUE) is team_names
+    # Another process (ingest.py, another server worker) rewrites the teams and records it in the manifest.
+    with sqlite3.connect(str(loaded_league)) as conn_data:
+        conn_data.execute(f"UPDATE {LEAGUE}_teams SET team_name = 'Renamed ' || id")
+        conn_data.execute(f"UPDATE ingest_manifest SET sha256 = 'rewritten' WHERE table_name = '{LEAGUE}_teams'")
+    renamed = utils.get_team_names(LEAGUE)
+    assert renamed.keys() == team_names.keys()
+    assert all(name == f'Renamed {team_id}' for team_id, name in renamed.items())
+    assert utils._team_names_cache.stats['size'] == 1
@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+
+import pytest
+
+import utils
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = utils.ConnectionPool(str(tmp_path / 'databases' / 'soccer_data.sqlite'), size=2)
+    with pool.write() as conn_data:
+        conn_data.execute('CREATE TABLE teams (id INTEGER PRIMARY KEY, name TEXT)')
+        conn_data.execute("INSERT INTO teams VALUES (1, 'Arsenal')")
+    yield pool
+    pool.close()
+
+
+def test_readers_are_read_only_and_reused(pool):
+    with pool.read() as conn_data:
+        assert conn_data.execute('SELECT name FROM teams').fetchall() == [('Arsenal',)]
+        with pytest.raises(sqlite3.OperationalError, match='readonly'):
+            conn_data.execute("INSERT INTO teams VALUES (2, 'Chelsea')")
+        first = conn_data
+    with pool.read() as conn_data:
+        assert conn_data is first
+    with pool.read() as conn_data:
+        assert conn_data.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+
+
+def test_pool_size_bounds_the_readers(pool):
+    acquired = []
+
+    def third_reader():
+        with pool.read() as conn_data:
+            acquired.append(conn_data)
+
+    with pool.read() as first, pool.read() as second:
+        assert first is not second
+        thread = threading.Thread(target=third_reader)
+        thread.start()
+        thread.join(0.2)
+        # Both connections are in use: the third reader waits for one instead of opening another.
+        assert thread.is_alive() and not acquired
+    thread.join(5)
+    assert acquired[0] in (first, second)
+
+
+def test_writer_commits_or_rolls_back(pool):
+    with pytest.raises(RuntimeError):
+        with pool.write() as conn_data:
+            conn_data.execute("INSERT INTO teams VALUES (2, 'Chelsea')")
+            raise RuntimeError('ingest failed')
+    with pool.read() as conn_data:
+        assert conn_data.execute('SELECT count(*) FROM teams').fetchone() == (1,)
+    with pool.write(('PRAGMA synchronous=OFF',)) as conn_data:
+        conn_data.execute("INSERT INTO teams VALUES (2, 'Chelsea')")
+    with pool.read() as conn_data:
+        assert conn_data.execute('SELECT count(*) FROM teams').fetchone() == (2,)
+
+
+def test_readers_see_the_last_commit_while_a_writer_runs(pool):
+    writing, committed = threading.Event(), threading.Event()
+    counts = []
+
+    def reader():
+        writing.wait()
+        with pool.read() as conn_data:
+            counts.append(conn_data.execute('SELECT count(*) FROM teams').fetchone()[0])
+        committed.set()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    with pool.write() as conn_data:
+        conn_data.execute("INSERT INTO teams VALUES (2, 'Chelsea')")
+        writing.set()
+        # WAL: the reader is not blocked by the open write transaction.
+        assert committed.wait(5)
+    thread.join(5)
+    assert counts == [1]
+
+
+def test_writers_are_serialized(pool):
+    order = []
+
+    def writer(name):
+        with pool.write() as conn_data:
+            order.append(f'{name} start')
+            conn_data.execute('INSERT INTO teams (name) VALUES (?)', (name,))
+            order.append(f'{name} end')
+
+    threads = [threading.Thread(target=writer, args=(f'writer {index}',)) for index in range(4)]
+    with pool.write_lock:
+        for thread in threads:
+            thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert all(order[position].endswith('start') and order[position + 1] == order[position].replace('start', 'end')
+               for position in range(0, len(order), 2))
+    with pool.read() as conn_data:
+        assert conn_data.execute('SELECT count(*) FROM teams').fetchone() == (5,)
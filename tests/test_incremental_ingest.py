@@ -0,0 +1,110 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+import config
+import utils
+from benchmarks.generate_data import generate
+
+LEAGUE = 'england'
+MATCHES = 6
+
+
+def _load(database, data_dir):
+    utils.configure_db_pool(str(database))
+    config.DATA_DIR = str(data_dir)
+    utils.Loader()(LEAGUE)
+
+
+def _snapshot():
+    utils._timeline_cubes.clear()
+    team_match_stats, player_stats = utils._rollup_tables(LEAGUE)
+    with utils.db_pool.read() as conn_data:
+        rollups = {table: sorted(conn_data.execute(f'SELECT * FROM {table}').fetchall())
+                   for table in (team_match_stats, player_stats)}
+        plans = {name: [row[-1] for row in conn_data.execute(f'EXPLAIN QUERY PLAN {query}').fetchall()]
+                 for name, query in utils._rollup_queries(conn_data, LEAGUE, 'ingest_watermarks').items()}
+    return rollups, utils.get_timeline_cube(LEAGUE), plans
+
+
+def _sorted_cube(cube):
+    order = np.argsort(cube.match_ids)
+    return cube.match_ids[order], cube.team_ids[order], cube.event_names, cube.data[order]
+
+
+@pytest.fixture
+def data_dirs(tmp_path):
+    full = tmp_path / 'full'
+    generate(str(full), [LEAGUE], MATCHES)
+    partial = tmp_path / 'partial'
+    partial.mkdir()
+    for source in full.iterdir():
+        (partial / source.name).write_bytes(source.read_bytes())
+    events = pq.read_table(str(full / f'events_{LEAGUE}.parquet'))
+    first_matches = pc.unique(events.column('matchId')).to_pylist()[:MATCHES // 2]
+    pq.write_table(events.filter(pc.is_in(events.column('matchId'), value_set=pa.array(first_matches))),
+                   str(partial / f'events_{LEAGUE}.parquet'))
+    yield full, partial
+    utils.db_pool.close()
+
+
+@pytest.mark.parametrize('layout', ['wide', 'compact'])
+def test_appending_matches_matches_a_full_load(tmp_path, monkeypatch, data_dirs, layout):
+    full, partial = data_dirs
+    monkeypatch.setattr(config, 'EVENTS_SCHEMA', layout)
+    monkeypatch.setattr(config, 'INGEST_INCREMENTAL', True)
+    monkeypatch.setattr(config, 'DATA_DIR', config.DATA_DIR)
+
+    _load(tmp_path / 'reference.sqlite', full)
+    reference_rollups, reference_cube, _ = _snapshot()
+
+    _load(tmp_path / 'incremental.sqlite', partial)
+    appended = []
+    append_events_db = utils.append_events_db
+    monkeypatch.setattr(utils, 'append_events_db',
+                        lambda data, league, match_ids: appended.append(match_ids) or
+                        append_events_db(data, league, match_ids))
+    (partial / f'events_{LEAGUE}.parquet').write_bytes((full / f'events_{LEAGUE}.parquet').read_bytes())
+    _load(tmp_path / 'incremental.sqlite', partial)
+    assert [len(match_ids) for match_ids in appended] == [MATCHES - MATCHES // 2]
+    assert len(utils.loaded_match_ids(LEAGUE)) == MATCHES
+    rollups, cube, delta_plans = _snapshot()
+
+    assert rollups == reference_rollups
+    for actual, expected in zip(_sorted_cube(cube), _sorted_cube(reference_cube)):
+        np.testing.assert_array_equal(actual, expected)
+    # The delta refresh looks the appended matches up instead of scanning the events table.
+    for plan in delta_plans.values():
+        events_steps = [step for step in plan if f'{LEAGUE}_events' in step]
+        assert events_steps and all(f'idx_{LEAGUE}_events_match' in step for step in events_steps
+                                    if not step.startswith('BLOOM FILTER'))
+
+
+@pytest.mark.parametrize('layout', ['wide', 'compact'])
+def test_editing_loaded_matches_rebuilds_the_league(tmp_path, monkeypatch, caplog, data_dirs, layout):
+    full, _ = data_dirs
+    monkeypatch.setattr(config, 'EVENTS_SCHEMA', layout)
+    monkeypatch.setattr(config, 'INGEST_INCREMENTAL', True)
+    monkeypatch.setattr(config, 'DATA_DIR', config.DATA_DIR)
+
+    _load(tmp_path / 'incremental.sqlite', full)
+    appended = []
+    monkeypatch.setattr(utils, 'append_events_db', lambda data, league, match_ids: appended.append(match_ids))
+    # Same matches, different content: every accurate flag flips.
+    events_path = str(full / f'events_{LEAGUE}.parquet')
+    events = pq.read_table(events_path)
+    accurate = events.schema.get_field_index('accurate')
+    pq.write_table(events.set_column(accurate, 'accurate', pc.invert(events.column(accurate))), events_path)
+    _load(tmp_path / 'incremental.sqlite', full)
+    assert appended == []
+    assert 'changed without adding matches' in caplog.text
+    assert utils.is_source_loaded(events_path, f'{LEAGUE}_events')
+    rollups, cube, _ = _snapshot()
+
+    _load(tmp_path / 'reference.sqlite', full)
+    reference_rollups, reference_cube, _ = _snapshot()
+    assert rollups == reference_rollups
+    for actual, expected in zip(_sorted_cube(cube), _sorted_cube(reference_cube)):
+        np.testing.assert_array_equal(actual, expected)
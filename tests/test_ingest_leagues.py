@@ -0,0 +1,22 @@
+import config
+import utils
+from benchmarks.generate_data import EVENTS_PER_MATCH, TEAMS_PER_LEAGUE, generate
+
+LEAGUES = ['england', 'france']
+MATCHES = 2
+
+
+def test_workers_read_the_parent_configuration(tmp_path, monkeypatch):
+    # Spawned workers import config from scratch: anything set in code has to reach them as arguments.
+    generate(str(tmp_path / 'data'), LEAGUES, MATCHES)
+    monkeypatch.setattr(config, 'DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(config, 'INGEST_BATCH_SIZE', 1000)
+    utils.configure_db_pool(str(tmp_path / 'databases' / 'soccer_data.sqlite'))
+    try:
+        saved = utils.ingest_leagues(LEAGUES, workers=2)
+        assert saved == {league: MATCHES * EVENTS_PER_MATCH for league in LEAGUES}
+        for league in LEAGUES:
+            assert utils.check_teams_db(league)[0] == TEAMS_PER_LEAGUE
+            assert all(utils.is_source_loaded(source[0], source[1]) for source in utils._league_only_sources(league))
+    finally:
+        utils.db_pool.close()
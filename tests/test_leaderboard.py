@@ -0,0 +1,33 @@
+import pytest
+
+import config
+import utils
+from benchmarks.generate_data import generate
+
+LEAGUES = ['england', 'france']
+
+
+@pytest.fixture(scope='module')
+def loaded_leagues(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('data')
+    generate(str(data_dir), LEAGUES, 4)
+    data_dir_before = config.DATA_DIR
+    config.DATA_DIR = str(data_dir)
+    utils.configure_db_pool(str(tmp_path_factory.mktemp('databases') / 'soccer_data.sqlite'))
+    for league in LEAGUES:
+        utils.Loader()(league)
+    yield
+    utils.db_pool.close()
+    config.DATA_DIR = data_dir_before
+
+
+@pytest.mark.parametrize('kind', ['scorers', 'assistants'])
+@pytest.mark.parametrize('limit', [5, 20, 60])
+def test_backends_return_the_same_leaderboard(loaded_leagues, monkeypatch, kind, limit):
+    # Over 20 rows the parquet backend has to keep more than each league's top 20.
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', 'sqlite')
+    expected = utils.get_leaderboard(LEAGUES, kind, limit)
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', 'parquet')
+    actual = utils.get_leaderboard(LEAGUES, kind, limit)
+    assert len(expected) == limit if limit <= 20 else len(expected) > 20
+    assert actual.equals(expected)
@@ -0,0 +1,55 @@
+import pytest
+
+import config
+import utils
+from benchmarks.generate_data import generate
+
+LEAGUE = 'england'
+EVENTS = f'{LEAGUE}_events'
+
+
+@pytest.fixture
+def wide_league(tmp_path, monkeypatch):
+    generate(str(tmp_path / 'data'), [LEAGUE], 2)
+    monkeypatch.setattr(config, 'DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(config, 'EVENTS_SCHEMA', 'wide')
+    utils.configure_db_pool(str(tmp_path / 'soccer_data.sqlite'))
+    utils.Loader()(LEAGUE)
+    yield
+    utils.db_pool.close()
+
+
+def _state():
+    with utils.db_pool.read() as conn_data:
+        rollups = {table: sorted(conn_data.execute(f'SELECT * FROM {table}').fetchall())
+                   for table in utils._rollup_tables(LEAGUE)}
+        indexes = {name for name, in conn_data.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND name LIKE 'idx_%'",
+            (EVENTS,)).fetchall()}
+    return utils.events_layout(LEAGUE), rollups, indexes
+
+
+def _wide_rows():
+    with utils.db_pool.read() as conn_data:
+        return conn_data.execute(f'SELECT * FROM {EVENTS} ORDER BY id').fetchall()
+
+
+def test_migration_round_trip(wide_league):
+    rows = _wide_rows()
+    layout, rollups, indexes = _state()
+    assert layout == 'wide' and indexes == {f'idx_{EVENTS}_{name}' for name in utils.EVENTS_INDEXES['wide']}
+
+    assert utils.migrate_events_schema(LEAGUE, 'compact', vacuum=False)
+    layout, compact_rollups, indexes = _state()
+    assert layout == 'compact' and compact_rollups == rollups
+    assert indexes == {f'idx_{EVENTS}_{name}' for name in utils.EVENTS_INDEXES['compact']}
+    assert utils.check_events_db(LEAGUE)[0] == len(rows)
+    assert utils.get_best_scorers_data(LEAGUE).goals_amount.sum() == sum(
+        1 for row in rows if row[3] == 'Shot' and row[8])
+    assert not utils.migrate_events_schema(LEAGUE, 'compact')
+
+    # Back to wide: names come from players, flags from the bits; nothing is lost on the way.
+    assert utils.migrate_events_schema(LEAGUE, 'wide')
+    layout, wide_rollups, _ = _state()
+    assert layout == 'wide' and wide_rollups == rollups
+    assert _wide_rows() == rows
@@ -0,0 +1,51 @@
+import pyarrow.parquet as pq
+import pytest
+
+import utils
+from benchmarks.generate_data import generate
+
+LEAGUE = 'england'
+MATCHES = 2
+
+
+@pytest.fixture
+def events(tmp_path):
+    generate(str(tmp_path / 'data'), [LEAGUE], MATCHES)
+    yield pq.read_table(str(tmp_path / 'data' / f'events_{LEAGUE}.parquet')).to_pandas()
+    utils.db_pool.close()
+
+
+def _load(database, events, layout):
+    utils.configure_db_pool(str(database))
+    utils.create_events_db(events, LEAGUE, layout=layout)
+    team_match_stats, player_stats = utils._rollup_tables(LEAGUE)
+    with utils.db_pool.read() as conn_data:
+        return {table: sorted(conn_data.execute(f'SELECT * FROM {table}').fetchall())
+                for table in (team_match_stats, player_stats)}
+
+
+def test_null_flags_count_as_false(tmp_path, events):
+    # Nullable parquet booleans arrive as None; a group whose flags are all NULL still gets 0 counters.
+    reference = {layout: _load(tmp_path / f'reference_{layout}.sqlite', events, layout)
+                 for layout in ('wide', 'compact')}
+    events = events.astype({flag: object for flag in ('accurate', 'goal', 'assist', 'keyPass')})
+    for flag in ('accurate', 'goal', 'assist', 'keyPass'):
+        events.loc[~events[flag].astype(bool) | (events.eventName == 'Duel'), flag] = None
+    for layout in ('wide', 'compact'):
+        rollups = _load(tmp_path / f'{layout}.sqlite', events, layout)
+        assert rollups == reference[layout]
+    assert reference['wide'] == reference['compact']
+
+
+@pytest.mark.parametrize('layout, team_scan', [
+    ('wide', f'SCAN {LEAGUE}_events'),
+    ('compact', f'SCAN {LEAGUE}_events USING COVERING INDEX idx_{LEAGUE}_events_event_team'),
+])
+def test_full_rollup_plans(tmp_path, events, layout, team_scan):
+    # A non-covering index scan costs a table lookup per event, so the wide layout reads the table itself.
+    _load(tmp_path / 'events.sqlite', events, layout)
+    with utils.db_pool.read() as conn_data:
+        plans = {name: [row[-1] for row in conn_data.execute(f'EXPLAIN QUERY PLAN {query}').fetchall()]
+                 for name, query in utils._rollup_queries(conn_data, LEAGUE).items()}
+    assert team_scan in plans['team_match_stats']
+    assert any(f'idx_{LEAGUE}_events_' in step and 'SCAN' not in step for step in plans['player_stats'])
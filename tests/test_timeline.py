@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import utils
+from benchmarks.generate_data import generate
+from timeline import HALF_MINUTES, MEASURES, MINUTES, TimelineCube
+
+LEAGUE = 'england'
+
+
+def _events(rows):
+    return pd.DataFrame(rows, columns=['id', 'matchId', 'teamId', 'eventName', 'eventSec', 'accurate', 'goal'])
+
+
+@pytest.fixture
+def cube():
+    return TimelineCube.from_events(_events([
+        # Match 10: team 2 is side 0 (lower teamId); stoppage time goes into minute 44.
+        (1, 10, 7, 'Pass', 30.0, True, False),
+        (2, 10, 2, 'Pass', 65.0, False, False),
+        (3, 10, 2, 'Shot', 2900.0, True, True),
+        # eventSec restarts: second half.
+        (4, 10, 7, 'Pass', 10.0, True, False),
+        (5, 10, 7, 'Shot', 3000.0, False, False),
+        (6, 20, 2, 'Duel', 120.0, False, False),
+    ]))
+
+
+def test_from_events_counts(cube):
+    assert cube.match_ids.tolist() == [10, 20]
+    assert cube.team_ids.tolist() == [[2, 7], [2, -1]]
+    assert cube.event_names == ['Duel', 'Pass', 'Shot']
+    assert cube.data.shape == (2, 2, MINUTES, 3, len(MEASURES))
+    passes = cube.match_timeline(10, 'Pass')
+    assert passes.loc[0, 7] == 1 and passes.loc[1, 2] == 1 and passes.loc[HALF_MINUTES, 7] == 1
+    assert passes.to_numpy().sum() == 3
+    assert cube.match_timeline(10, 'Pass', 'accurate').to_numpy().sum() == 2
+    goals = cube.match_timeline(10, 'Shot', 'goals')
+    assert goals.loc[HALF_MINUTES - 1, 2] == 1 and goals.to_numpy().sum() == 1
+    assert cube.match_timeline(10, 'Shot').loc[MINUTES - 1, 7] == 1
+    assert cube.team_matches(2) == [10, 20] and cube.team_matches(7) == [10]
+    assert cube.match_teams(20) == [2]
+    assert cube.team_minutes(2, 'Duel').sum() == 1
+    assert cube.team_minutes(2, 'Offside').shape == (2, MINUTES)
+    curve = cube.team_accuracy_curve(7)
+    assert curve[0] == 1 and curve[HALF_MINUTES] == 1 and np.isnan(curve[1])
+
+
+def test_merge_and_round_trip(cube):
+    update = TimelineCube.from_events(_events([
+        (7, 20, 2, 'Offside', 60.0, False, False),
+        (8, 30, 5, 'Pass', 60.0, True, False),
+    ]))
+    merged = cube.merge(update)
+    assert sorted(merged.match_ids.tolist()) == [10, 20, 30]
+    assert merged.event_names == ['Duel', 'Offside', 'Pass', 'Shot']
+    # The newer cube replaces match 20 as a whole.
+    assert merged.team_minutes(2, 'Duel').sum() == 0 and merged.team_minutes(2, 'Offside').sum() == 1
+    assert merged.match_timeline(10, 'Pass').equals(cube.match_timeline(10, 'Pass'))
+    decoded = TimelineCube.from_bytes(merged.to_bytes())
+    np.testing.assert_array_equal(decoded.data, merged.data)
+    assert decoded.event_names == merged.event_names and decoded.team_matches(5) == [30]
+    assert TimelineCube.empty().merge(cube).data.shape == cube.data.shape
+
+
+def test_null_flags_count_as_false():
+    # Nullable parquet booleans decode to None (object) or NaN (float): neither may turn into a counter.
+    events = _events([
+        (1, 10, 2, 'Pass', 30.0, None, None),
+        (2, 10, 7, 'Pass', 30.0, True, np.nan),
+        (3, 10, 7, 'Shot', 40.0, np.nan, True),
+    ])
+    cube = TimelineCube.from_events(events)
+    assert cube.data.min() == 0
+    assert cube.data[..., MEASURES.index('accurate')].sum() == 1
+    assert cube.data[..., MEASURES.index('goals')].sum() == 1
+
+
+@pytest.mark.parametrize('layout', ['wide', 'compact'])
+def test_refresh_timeline_with_null_flags(tmp_path, layout):
+    generate(str(tmp_path / 'data'), [LEAGUE], 2)
+    events = pq.read_table(str(tmp_path / 'data' / f'events_{LEAGUE}.parquet')).to_pandas()
+    reference = TimelineCube.from_events(events)
+    events = events.astype({'accurate': object, 'goal': object})
+    events.loc[~events.accurate.astype(bool), 'accurate'] = None
+    events.loc[~events.goal.astype(bool), 'goal'] = None
+    utils.configure_db_pool(str(tmp_path / 'events.sqlite'))
+    try:
+        utils.create_events_db(events, LEAGUE, layout=layout)
+        with utils.db_pool.write() as conn_data:
+            cube = utils.refresh_timeline(conn_data.cursor(), LEAGUE, batch_size=500)
+    finally:
+        utils.db_pool.close()
+    np.testing.assert_array_equal(cube.match_ids, reference.match_ids)
+    np.testing.assert_array_equal(cube.data, reference.data)
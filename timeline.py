@@ -0,0 +1,134 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+HALF_MINUTES = 45
+MINUTES = 2 * HALF_MINUTES
+# Per (match, team, minute, event type) counters kept in the cube.
+MEASURES = ('events', 'accurate', 'goals')
+# eventSec restarts with every half: a drop larger than this inside a match starts the second half.
+HALF_BREAK_SECONDS = 600
+# Columns from_events needs, in the order the backends select them.
+EVENT_COLUMNS = ['id', 'matchId', 'teamId', 'eventName', 'eventSec', 'accurate', 'goal']
+
+
+class TimelineCube:
+    """Per-minute event counters of one league as a dense array.
+
+    data[match, side, minute, event type, measure], where side 0/1 is the match's team with
+    the lower/higher teamId (team_ids[match]) and measure indexes MEASURES. Stoppage time is
+    counted in the last minute of its half; extra time in the second half.
+    """
+
+    def __init__(self, match_ids, team_ids, event_names, data):
+        self.match_ids = np.asarray(match_ids, dtype=np.int64)
+        self.team_ids = np.asarray(team_ids, dtype=np.int64).reshape(len(self.match_ids), 2)
+        self.event_names = list(event_names)
+        self.data = data
+        self._match_positions = {match_id: position for position, match_id in enumerate(self.match_ids)}
+
+    @classmethod
+    def empty(cls):
+        return cls([], np.empty((0, 2)), [], np.zeros((0, 2, MINUTES, 0, len(MEASURES)), dtype=np.int32))
+
+    @classmethod
+    def from_events(cls, events):
+        events = events.sort_values(['matchId', 'id'], kind='mergesort')
+        if events.empty:
+            return cls.empty()
+        match_ids, match_index = np.unique(events.matchId.to_numpy(), return_inverse=True)
+        team_column = events.teamId.to_numpy(dtype=np.int64)
+        seconds = np.clip(events.eventSec.to_numpy(dtype=float), 0, None)
+
+        rows = np.arange(len(events))
+        first_row = np.r_[True, match_index[1:] != match_index[:-1]]
+        half_break = np.r_[False, seconds[1:] < seconds[:-1] - HALF_BREAK_SECONDS] & ~first_row
+        breaks = np.cumsum(half_break)
+        half = np.minimum(breaks - breaks[np.maximum.accumulate(np.where(first_row, rows, 0))], 1)
+        minute = np.minimum(seconds // 60, HALF_MINUTES - 1).astype(np.int64) + HALF_MINUTES * half
+
+        teams = pd.DataFrame({'match': match_index, 'team': team_column}).drop_duplicates().sort_values(
+            ['match', 'team'])
+        teams['side'] = teams.groupby('match').cumcount()
+        teams = teams[teams.side < 2]
+        team_ids = np.full((len(match_ids), 2), -1, dtype=np.int64)
+        team_ids[teams.match.to_numpy(), teams.side.to_numpy()] = teams.team.to_numpy()
+        side = np.where(team_ids[match_index, 0] == team_column, 0, 1)
+        known_team = team_ids[match_index, side] == team_column
+
+        event_codes, event_names = pd.factorize(events.eventName, sort=True)
+        shape = (len(match_ids), 2, MINUTES, len(event_names))
+        cells = np.ravel_multi_index((match_index, side, minute, event_codes), shape)[known_team]
+        size = int(np.prod(shape))
+        # Missing (NULL) flags count as not set; a NaN weight would poison the whole cell.
+        accurate, goal = (events[flag].fillna(0).to_numpy(dtype=float)[known_team] for flag in ('accurate', 'goal'))
+        data = np.stack([
+            np.bincount(cells, minlength=size),
+            np.bincount(cells, weights=accurate, minlength=size),
+            np.bincount(cells, weights=goal, minlength=size),
+        ], axis=-1).astype(np.int32).reshape(shape + (len(MEASURES),))
+        return cls(match_ids, team_ids, event_names, data)
+
+    def merge(self, other):
+        """A cube with the matches of both; other wins for matches present in both."""
+        event_names = sorted(set(self.event_names) | set(other.event_names))
+        keep = ~np.isin(self.match_ids, other.match_ids)
+        data = np.concatenate([self._reindex(event_names)[keep], other._reindex(event_names)])
+        return TimelineCube(np.r_[self.match_ids[keep], other.match_ids],
+                            np.concatenate([self.team_ids[keep], other.team_ids]), event_names, data)
+
+    def _reindex(self, event_names):
+        data = np.zeros(self.data.shape[:3] + (len(event_names), len(MEASURES)), dtype=np.int32)
+        data[:, :, :, [event_names.index(name) for name in self.event_names]] = self.data
+        return data
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, match_ids=self.match_ids, team_ids=self.team_ids,
+                            event_names=np.array(self.event_names, dtype=str), data=self.data)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload)) as arrays:
+            return cls(arrays['match_ids'], arrays['team_ids'], arrays['event_names'].tolist(), arrays['data'])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.match_ids.nbytes + self.team_ids.nbytes
+
+    def _counts(self, event_name, measure):
+        # (match, side, minute) counters of one event type; zeros if the league never had it.
+        if event_name not in self.event_names:
+            return np.zeros(self.data.shape[:3], dtype=np.int32)
+        return self.data[:, :, :, self.event_names.index(event_name), MEASURES.index(measure)]
+
+    def match_teams(self, match_id):
+        return [team_id for team_id in self.team_ids[self._match_positions[match_id]] if team_id >= 0]
+
+    def team_matches(self, team_id):
+        return self.match_ids[(self.team_ids == team_id).any(axis=1)].tolist()
+
+    def team_minutes(self, team_id, event_name, measure='events'):
+        """(matches of the team, minute) counters of one event type, in match_ids order."""
+        played = self.team_ids == team_id
+        return self._counts(event_name, measure)[played]
+
+    def team_curve(self, team_id, event_name, measure='events'):
+        """Season average per match for every minute."""
+        minutes = self.team_minutes(team_id, event_name, measure)
+        return minutes.mean(axis=0) if len(minutes) else np.zeros(MINUTES)
+
+    def team_accuracy_curve(self, team_id, event_name='Pass'):
+        """Share of accurate events per minute over the whole season (NaN where there were none)."""
+        events = self.team_minutes(team_id, event_name).sum(axis=0)
+        accurate = self.team_minutes(team_id, event_name, 'accurate').sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(events > 0, accurate / events, np.nan)
+
+    def match_timeline(self, match_id, event_name, measure='events'):
+        """Minute x team counters of one match."""
+        position = self._match_positions[match_id]
+        return pd.DataFrame(self._counts(event_name, measure)[position].T,
+                            columns=self.team_ids[position], index=pd.RangeIndex(MINUTES, name='minute'))
@@ -1,90 +1,892 @@
+import fcntl
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
 import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime as dt
+from functools import wraps
+from itertools import islice
 import pandas as pd
 import logging as logger
 logger.basicConfig(level=logger.INFO)
 import numpy as np
+import psutil
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import plotly.graph_objects as go
+import plotly.utils
+
+import config
+import metrics
+import parquet_backend
+import profiling
+import timeline
+
+
+def backend_dispatch(function):
+    # Routes a query helper to parquet_backend when config.STORAGE_BACKEND selects it.
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if config.STORAGE_BACKEND == 'parquet':
+            return getattr(parquet_backend, function.__name__)(*args, **kwargs)
+        return function(*args, **kwargs)
+    return wrapper
 
 
 class Loader:
     def __init__(self):
         self.cache = []
+        # Highest RSS (bytes) sampled while ingesting each league.
+        self.peak_rss = {}
 
     def __call__(self, input_league):
+        if config.STORAGE_BACKEND == 'parquet':
+            # Queries read the parquet files directly, there is nothing to ingest.
+            self.cache.append(input_league)
+            return True
+        started = time.perf_counter()
+        stale_sources = [source for source in league_sources(input_league)
+                         if not is_source_loaded(source[0], source[1])]
+        if not stale_sources:
+            ensure_events_indexes(input_league)
+            ensure_rollups(input_league)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f'  Data from {input_league} is up to date, ingest skipped ({elapsed_ms:.1f} ms)')
+            self.cache.append(input_league)
+            return True
         logger.info(f'  ------------------------------------------')
         logger.info(f'  Starting load data from {input_league}')
         logger.info(f'  {dt.now()}')
-        teams_data = pd.read_parquet(f"data/event_data/teams_{input_league}.parquet")
-        events_data = pd.read_parquet(f"data/event_data/events_{input_league}.parquet")
-        players_data = pd.read_parquet(f"data/event_data/players.parquet")
-        create_teams_db(teams_data, input_league)
-        create_events_db(events_data, input_league)
-        create_players_db(players_data)
-        saved_teams_amount = check_teams_db(input_league)[0]
-        saved_events_amount = check_events_db(input_league)[0]
-        saved_playrs_amount = check_players_db()[0]
-        logger.info(f'  Loaded and saved {saved_teams_amount} teams')
-        logger.info(f'  Loaded and saved {saved_events_amount} events')
-        logger.info(f'  Loaded and saved {saved_playrs_amount} players')
-        logger.info(f'  Data from {input_league} was loaded!')
+        peak_rss = PeakRss()
+        for source in stale_sources:
+            ingest_source(source, input_league, peak_rss)
+        self.peak_rss[input_league] = peak_rss.peak
+        logger.info(f'  Data from {input_league} was loaded! (peak RSS {peak_rss.peak / 2 ** 20:.0f} MiB)')
         logger.info(f'  ------------------------------------------')
         self.cache.append(input_league)
         return True
 
+    @staticmethod
+    def _timed_ingest(league, table, create_db, *args):
+        # Includes reading the parquet batches, which are streamed into create_db.
+        started = time.perf_counter()
+        rows_amount = create_db(*args)
+        elapsed = time.perf_counter() - started
+        metrics.observe(f"insert_{table.split('_')[-1]}", elapsed, league)
+        rate = rows_amount / elapsed if elapsed else float(rows_amount)
+        logger.info(f'  Ingested {rows_amount} {table} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)')
+        return rows_amount
+
 
 class StatisticCollector:
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, cache=None, shared_cache=None):
+        # Keyed by (league, data version): a re-ingested league misses instead of serving stale frames.
+        self.cache = cache if cache is not None else ResultCache(
+            maxsize=config.STATISTIC_CACHE_SIZE, max_bytes=int(config.STATISTIC_CACHE_MAX_MB * 2 ** 20),
+            ttl=config.STATISTIC_CACHE_TTL)
+        if shared_cache is None and config.SHARED_CACHE_DIR:
+            shared_cache = SharedResultCache(config.SHARED_CACHE_DIR)
+        self.shared_cache = shared_cache
+
+    def cached(self, input_league):
+        version = get_data_version(input_league)
+        result = self.cache.get((input_league, version))
+        if result is None and self.shared_cache is not None:
+            # Another worker process may already have computed this version.
+            result = self.shared_cache.load(input_league, version)
+            if result is not None:
+                self._remember(input_league, version, result)
+        return result
 
     def __call__(self, input_league):
+        version = get_data_version(input_league)
+        if self.shared_cache is None:
+            return self._compute(input_league, version)
+        with self.shared_cache.lock(input_league):
+            result = self.shared_cache.load(input_league, version)
+            if result is None:
+                result = self._compute(input_league, version)
+                self.shared_cache.store(input_league, version, result)
+            else:
+                self._remember(input_league, version, result)
+        return result
+
+    @staticmethod
+    def _comparison_key(leagues):
+        leagues = tuple(sorted(leagues))
+        return 'compare', leagues, tuple(get_data_version(league) for league in leagues)
+
+    def cached_comparison(self, leagues):
+        return self.cache.get(self._comparison_key(leagues))
+
+    def compare(self, leagues):
+        """Cross-league leaderboards and team comparison: (scorers, assistants, teams)."""
+        key = self._comparison_key(leagues)
+        leagues = list(key[1])
+        with metrics.timed('query_compare', ','.join(leagues)):
+            result = (get_leaderboard(leagues, 'scorers'), get_leaderboard(leagues, 'assistants'),
+                      compare_teams(leagues))
+        self.cache.invalidate(lambda cached_key: cached_key[:2] == key[:2])
+        self.cache.put(key, result)
+        return result
+
+    def _remember(self, input_league, version, result):
+        # Older versions of this league can never be hit again.
+        self.cache.invalidate(lambda key: key[0] == input_league)
+        self.cache.put((input_league, version), result)
+
+    def _compute(self, input_league, version):
         logger.info(f'  ------------------------------------------')
         logger.info(f'Computing statistic for {input_league} ...')
-        teams_data = get_data_for_teams_graph(input_league)
-        passing_data = compute_teams_pass_statistic(input_league)
-        shoting_data = compute_teams_shot_statistic(input_league)
-        best_scorrers = get_best_scorers_data(input_league)
-        best_assistants = get_best_assistants_data(input_league)
-        self.cache[input_league] = (teams_data, passing_data,
-                                    shoting_data, best_scorrers,
-                                    best_assistants)
+        with metrics.timed('query_teams_graph', input_league):
+            teams_data = get_data_for_teams_graph(input_league)
+        with metrics.timed('query_team_statistic', input_league):
+            team_statistic = compute_teams_statistic(input_league)
+        passing_data = team_statistic.sort_values("accurate_passes_per_match")
+        shoting_data = team_statistic.sort_values("accurate_shots_per_match")
+        with metrics.timed('query_best_scorers', input_league):
+            best_scorrers = get_best_scorers_data(input_league)
+        with metrics.timed('query_best_assistants', input_league):
+            best_assistants = get_best_assistants_data(input_league)
+        result = (teams_data, passing_data,
+                  shoting_data, best_scorrers,
+                  best_assistants)
+        self._remember(input_league, version, result)
         logger.info(f'Statistic for {input_league} was computed!')
         logger.info(f'  ------------------------------------------')
-        return self.cache[input_league]
+        return result
 
+    @staticmethod
+    def explain(input_league):
+        plans = explain_statistic_queries(input_league)
+        for name, plan in plans.items():
+            logger.info(f'  Query plan for {name} ({input_league}):')
+            for step in plan:
+                logger.info(f'    {step}')
+        return plans
 
-def create_teams_db(data, league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    league = f"{league}_teams"
-    query = f'CREATE TABLE IF NOT EXISTS {league} ( \
-           id              INTEGER UNIQUE NOT NULL PRIMARY KEY, \
-           team_name            TEXT NOT NULL, \
-           position               INTEGER,\
-           goals               INTEGER, \
-           points               INTEGER, \
-           goalsDiff               INTEGER \
+
+def _remove_database_files(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _ingest_league_shard(league, shard_path, sources, layout, batch_size, pragmas):
+    # Runs in a worker process: parse one league and write it into a private shard database,
+    # so workers never compete for the main database's write lock. A spawned worker imports
+    # config afresh, so the sources ((parquet file, table, columns) of teams and events), batch
+    # size and pragmas come resolved from the parent.
+    global db_pool, INGEST_PRAGMAS
+    _remove_database_files(shard_path)
+    db_pool = ConnectionPool(shard_path, size=1)
+    INGEST_PRAGMAS = pragmas
+    (teams_path, _, teams_columns), (events_path, _, events_columns) = sources
+    fingerprints = [(source_path, table_name, source_fingerprint(source_path))
+                    for source_path, table_name, _ in sources]
+    peak_rss = PeakRss()
+    create_teams_db(read_parquet_batches(teams_path, teams_columns, batch_size, on_batch=peak_rss.sample),
+                    league, batch_size)
+    create_events_db(read_parquet_batches(events_path, events_columns, batch_size, on_batch=peak_rss.sample),
+                     league, batch_size, build_derived=False, layout=layout)
+    db_pool.close()
+    return league, shard_path, fingerprints, peak_rss.peak
+
+
+def merge_league_shard(league, shard_path, fingerprints):
+    league_events = f"{league}_events"
+    tables = [f"{league}_teams", league_events]
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        cur_data.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+        for table in tables:
+            if not _table_exists(cur_data, table):
+                query = 'SELECT sql FROM shard.sqlite_master WHERE type="table" AND name=?'
+                cur_data.execute(cur_data.execute(query, (table,)).fetchone()[0])
+        layout = _events_layout(cur_data, league_events)
+        _drop_indexes(cur_data, league_events, ALL_EVENTS_INDEXES)
+        for table in tables:
+            if table == league_events and layout == 'compact':
+                # Event type ids are local to each database: translate them by name.
+                _event_type_ids(cur_data)
+                cur_data.execute('INSERT OR IGNORE INTO main.event_types (name) SELECT name FROM shard.event_types')
+                cur_data.execute(f'INSERT OR IGNORE INTO main.{table} (id, matchId, eventSec, eventTypeId, '
+                                 f'teamId, playerId, flags) SELECT shard_events.id, matchId, eventSec, '
+                                 f'main_types.id, teamId, playerId, flags FROM shard.{table} AS shard_events '
+                                 f'JOIN shard.event_types AS shard_types ON shard_types.id = shard_events.eventTypeId '
+                                 f'JOIN main.event_types AS main_types ON main_types.name = shard_types.name')
+            else:
+                cur_data.execute(f'INSERT OR IGNORE INTO main.{table} SELECT * FROM shard.{table}')
+        _create_indexes(cur_data, league_events, EVENTS_INDEXES[layout])
+        refresh_rollups(cur_data, league)
+        conn_data.commit()
+        cur_data.execute('DETACH DATABASE shard')
+    _team_names_cache.invalidate(lambda key: key[0] == league)
+    for source_path, table_name, fingerprint in fingerprints:
+        update_manifest(source_path, table_name, fingerprint, _count_rows(table_name)[0])
+    _remove_database_files(shard_path)
+
+
+def ingest_leagues(leagues=config.INGEST_LEAGUES, workers=config.INGEST_WORKERS, force=False):
+    """Ingests several leagues in parallel worker processes; returns {league: saved events amount}."""
+    started = time.perf_counter()
+    stale_leagues = [league for league in leagues
+                     if force or not all(is_source_loaded(source[0], source[1])
+                                         for source in _league_only_sources(league))]
+    logger.info(f'  Ingesting {len(stale_leagues)} of {len(leagues)} leagues: {", ".join(stale_leagues)}')
+    saved = {}
+    if config.INGEST_INCREMENTAL and not force:
+        # Leagues with loaded matches only need their new matches appended, which is cheaper
+        # in place than through a full shard.
+        for league in [league for league in stale_leagues if loaded_match_ids(league)]:
+            for source in _league_only_sources(league):
+                if not is_source_loaded(source[0], source[1]):
+                    ingest_source(source, league)
+            stale_leagues.remove(league)
+            saved[league] = check_events_db(league)[0]
+    shards_dir = os.path.join(os.path.dirname(db_pool.database), 'shards')
+    os.makedirs(shards_dir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        # players.parquet is shared by every league, so the workers get the league's own files only.
+        futures = {executor.submit(_ingest_league_shard, league, os.path.join(shards_dir, f'{league}.sqlite'),
+                                   [(source[0], source[1], source[4]) for source in _league_only_sources(league)],
+                                   events_layout(league), config.INGEST_BATCH_SIZE, INGEST_PRAGMAS): league
+                   for league in stale_leagues}
+        # The shared players file is read once, here, while the workers parse their leagues.
+        source = players_source()
+        if force or not is_source_loaded(source[0], source[1]):
+            ingest_source(source)
+        # Shards are merged one at a time as workers finish, while the others keep parsing.
+        for future in as_completed(futures):
+            league = futures[future]
+            try:
+                league, shard_path, fingerprints, peak_rss = future.result()
+                merge_league_shard(league, shard_path, fingerprints)
+            except Exception:
+                logger.exception(f'  Ingest of {league} failed')
+                continue
+            saved[league] = check_events_db(league)[0]
+            logger.info(f'  Data from {league} was loaded ({saved[league]} events, '
+                        f'worker peak RSS {peak_rss / 2 ** 20:.0f} MiB)')
+    logger.info(f'  Ingested {len(saved)} leagues in {time.perf_counter() - started:.2f}s')
+    return saved
+
+class DataRegistry:
+    """Process-wide Loader/StatisticCollector pair with per-league single-flight locking."""
+
+    def __init__(self, job_workers=config.JOB_WORKERS):
+        self.loader = Loader()
+        self.statistic_collector = StatisticCollector()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0}
+        self._executor = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix='league-job')
+        self._jobs = {}
+        self._progress = {}
+
+    def is_ready(self, league):
+        return (league, get_data_version(league)) in self.statistic_collector.cache
+
+    def _current_job(self, league):
+        # Called under self._lock. A finished job whose statistic has since left the cache (evicted,
+        # expired or superseded by a new data version) no longer describes the league: forget it.
+        job = self._jobs.get(league)
+        if job is not None and job.done() and job.exception() is None and not self.is_ready(league):
+            del self._jobs[league]
+            self._progress.pop(league, None)
+            return None
+        return job
+
+    def submit(self, league):
+        # Queues load + statistic for a league once; later calls return the same job until it fails
+        # or its result is gone from the cache.
+        with self._lock:
+            job = self._current_job(league)
+            if job is not None and not (job.done() and job.exception() is not None):
+                return job
+            self._progress[league] = 'queued'
+            job = self._executor.submit(profiling.propagate(self._run_job, 'league_job'), league)
+            self._jobs[league] = job
+            return job
+
+    def progress(self, league):
+        if self.is_ready(league):
+            return 'ready'
+        with self._lock:
+            self._current_job(league)
+            return self._progress.get(league, 'idle')
+
+    def _set_progress(self, league, stage):
+        with self._lock:
+            self._progress[league] = stage
+
+    def _run_job(self, league):
+        try:
+            self._set_progress(league, 'loading')
+            self.load(league)
+            self._set_progress(league, 'computing')
+            self.statistic(league)
+            self._set_progress(league, 'ready')
+        except Exception:
+            logger.exception(f'  Background job for {league} failed')
+            self._set_progress(league, 'failed')
+            raise
+
+    def load(self, league):
+        self._single_flight(('load', league),
+                            lambda: True if league in self.loader.cache else None,
+                            lambda: self.loader(input_league=league))
+
+    def statistic(self, league):
+        self.load(league)
+        return self._single_flight(('statistic', league),
+                                   lambda: self.statistic_collector.cached(league),
+                                   lambda: self.statistic_collector(league))
+
+    def comparison(self, leagues):
+        for league in leagues:
+            self.load(league)
+        return self._single_flight(('compare', tuple(sorted(leagues))),
+                                   lambda: self.statistic_collector.cached_comparison(leagues),
+                                   lambda: self.statistic_collector.compare(leagues))
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _single_flight(self, key, lookup, compute):
+        # lookup() returns the ready value or None; compute() produces (and caches) it.
+        value = lookup()
+        if value is not None:
+            self._count('hits')
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        if not key_lock.acquire(blocking=False):
+            # Somebody else is already loading/computing this league: wait for their result.
+            self._count('waits')
+            key_lock.acquire()
+        try:
+            value = lookup()
+            if value is not None:
+                return value
+            self._count('misses')
+            return compute()
+        finally:
+            key_lock.release()
+
+
+def estimate_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU bounded by entry count and/or estimated memory, with an optional TTL (seconds).
+
+    A bound of None (or 0) disables it. The most recently stored entry is never evicted,
+    so a single value larger than max_bytes is still kept.
+    """
+
+    def __init__(self, maxsize=None, max_bytes=None, ttl=None, sizeof=estimate_nbytes):
+        self.maxsize = maxsize or None
+        self.max_bytes = max_bytes or None
+        self.ttl = ttl or None
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def put(self, key, value):
+        nbytes = self._sizeof(value)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, nbytes, time.monotonic())
+            self._bytes += nbytes
+            while len(self._entries) > 1 and (
+                    (self.maxsize and len(self._entries) > self.maxsize) or
+                    (self.max_bytes and self._bytes > self.max_bytes)):
+                self._discard(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, predicate):
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._discard(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self):
+        # 0 in maxsize/max_bytes means unbounded.
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), bytes=self._bytes,
+                        maxsize=self.maxsize or 0, max_bytes=self.max_bytes or 0)
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+            self._discard(key)
+            self._stats['expirations'] += 1
+            return None
+        return entry
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+class SharedResultCache:
+    """StatisticCollector results shared between worker processes as parquet files.
+
+    Each result lives in directory/{league}/{version}/ and is published by renaming a fully
+    written temporary directory, so readers never see a partial result. A per-league file
+    lock keeps concurrent workers from computing the same league twice.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+    def load(self, league, version):
+        path = os.path.join(self.directory, league, version)
+        try:
+            with open(os.path.join(path, 'meta.json')) as meta_file:
+                meta = json.load(meta_file)
+            if meta['version'] != version:
+                raise ValueError(f'{path} holds version {meta["version"]}')
+            result = tuple(pd.read_parquet(os.path.join(path, f'{position}.parquet'))
+                           for position in range(meta['frames']))
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError, KeyError):
+            # Superseded and removed under us, or written by an incompatible version: recompute.
+            logger.warning(f'  Ignoring unreadable shared cache entry {path}', exc_info=True)
+            self._count('misses')
+            return None
+        self._count('hits')
+        return result
+
+    def store(self, league, version, result):
+        league_dir = os.path.join(self.directory, league)
+        os.makedirs(league_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=league_dir)
+        try:
+            for position, frame in enumerate(result):
+                frame.to_parquet(os.path.join(staging, f'{position}.parquet'))
+            with open(os.path.join(staging, 'meta.json'), 'w') as meta_file:
+                json.dump({'league': league, 'version': version, 'frames': len(result)}, meta_file)
+            os.rename(staging, os.path.join(league_dir, version))
+        except OSError:
+            # Another worker published the same version first; theirs is as good as ours.
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        self._count('writes')
+        for name in os.listdir(league_dir):
+            if name != version and not name.startswith('.') and not name.endswith('.lock'):
+                shutil.rmtree(os.path.join(league_dir, name), ignore_errors=True)
+        return True
+
+    @contextmanager
+    def lock(self, league):
+        league_dir = os.path.join(self.directory, league)
+        os.makedirs(league_dir, exist_ok=True)
+        with open(os.path.join(league_dir, 'compute.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+
+class FigureCache(ResultCache):
+    """LRU of rendered page contents keyed by (page, league, data version), stored pre-serialized."""
+
+    def __init__(self, maxsize=config.FIGURE_CACHE_SIZE):
+        super().__init__(maxsize=maxsize)
+
+    def get_or_build(self, key, build):
+        content = self.get(key)
+        if content is not None:
+            return content
+        page, league = key[0], key[1]
+        with metrics.timed(f'figures_{page}', league):
+            content = build()
+        with metrics.timed(f'serialize_{page}', league):
+            content = serialize_component(content)
+        self.invalidate(lambda cached_key: cached_key[:2] == (page, league))
+        self.put(key, content)
+        return content
+
+
+def serialize_component(component):
+    # Plain dicts/lists are what Dash would send anyway; encoding figures once makes warm hits a lookup.
+    return json.loads(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+class ConnectionPool:
+    """Bounded pool of read-only SQLite connections plus a serialized writer, both on a WAL database."""
+
+    def __init__(self, database=config.DB_PATH, size=config.DB_POOL_SIZE):
+        self.database = database
+        self.size = size
+        self.write_lock = threading.RLock()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._initialized = False
+
+    @contextmanager
+    def read(self):
+        self._ensure_database()
+        conn_data = self._acquire()
+        try:
+            yield conn_data
+        finally:
+            self._idle.put(conn_data)
+
+    @contextmanager
+    def write(self, pragmas=()):
+        self._ensure_database()
+        with self.write_lock:
+            conn_data = sqlite3.connect(self.database, timeout=config.DB_BUSY_TIMEOUT)
+            try:
+                for pragma in pragmas:
+                    conn_data.execute(pragma)
+                yield conn_data
+                conn_data.commit()
+            except BaseException:
+                conn_data.rollback()
+                raise
+            finally:
+                conn_data.close()
+
+    def close(self):
+        while True:
+            try:
+                conn_data = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn_data.close()
+            with self._lock:
+                self._opened -= 1
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return sqlite3.connect(f'file:{self.database}?mode=ro', uri=True,
+                                   timeout=config.DB_BUSY_TIMEOUT, check_same_thread=False)
+        except sqlite3.Error:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _ensure_database(self):
+        if self._initialized:
+            return
+        with self.write_lock:
+            if self._initialized:
+                return
+            directory = os.path.dirname(self.database)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # WAL is persistent: readers keep working on the last snapshot while an ingest is writing.
+            conn_data = sqlite3.connect(self.database, timeout=config.DB_BUSY_TIMEOUT)
+            conn_data.execute('PRAGMA journal_mode=WAL')
+            conn_data.close()
+            self._initialized = True
+
+
+db_pool = ConnectionPool()
+
+
+def configure_db_pool(database=config.DB_PATH, size=config.DB_POOL_SIZE):
+    global db_pool
+    db_pool.close()
+    db_pool = ConnectionPool(database, size)
+    return db_pool
+
+
+def _table_exists(conn_data, table_name):
+    query = 'SELECT count(*) FROM sqlite_master WHERE type="table"  AND name=?'
+    return bool(conn_data.execute(query, (table_name,)).fetchone()[0])
+
+
+# Parquet columns each create_*_db function reads; nothing else is decoded during ingest.
+TEAMS_COLUMNS = ['teamId', 'teamName', 'position', 'goals', 'points', 'goalsDiff']
+EVENTS_COLUMNS = ['id', 'matchId', 'eventSec', 'eventName', 'teamId', 'playerId', 'playerName',
+                  'accurate', 'goal', 'assist', 'keyPass']
+PLAYERS_COLUMNS = ['playerId', 'playerStrongFoot', 'playerName', 'playerPosition']
+
+
+def players_source():
+    return (os.path.join(config.DATA_DIR, "players.parquet"), "players",
+            create_players_db, lambda: check_players_db()[0], PLAYERS_COLUMNS)
+
+
+def league_sources(league):
+    # (parquet file, target table, ingest function, row count check, columns) in load order.
+    return [
+        (os.path.join(config.DATA_DIR, f"teams_{league}.parquet"), f"{league}_teams",
+         lambda data: create_teams_db(data, league), lambda: check_teams_db(league)[0], TEAMS_COLUMNS),
+        (os.path.join(config.DATA_DIR, f"events_{league}.parquet"), f"{league}_events",
+         lambda data: create_events_db(data, league), lambda: check_events_db(league)[0], EVENTS_COLUMNS),
+        players_source(),
+    ]
+
+
+def _league_only_sources(league):
+    return [source for source in league_sources(league) if source[1] != 'players']
+
+
+def read_parquet_batches(path, columns, batch_size=config.INGEST_BATCH_SIZE, on_batch=None, league='',
+                         match_ids=None):
+    """Yields the file as DataFrames of at most batch_size rows, decoding only the given columns.
+
+    With match_ids only the rows of those matches are returned (row groups whose matchId
+    statistics exclude them are skipped).
+    """
+    source = pq.ParquetFile(path)
+    if match_ids is not None:
+        batches = ds.dataset(path, format='parquet').to_batches(
+            columns=columns, filter=ds.field('matchId').isin(match_ids), batch_size=batch_size)
+    elif hasattr(source, 'iter_batches'):
+        batches = source.iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        # pyarrow < 3 can only stream whole row groups.
+        batches = (batch for row_group in range(source.num_row_groups)
+                   for batch in source.read_row_group(row_group, columns=columns).to_batches(batch_size))
+    elapsed = 0.0
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            break
+        frame = batch.to_pandas()
+        elapsed += time.perf_counter() - started
+        if on_batch is not None:
+            on_batch()
+        yield frame
+    metrics.observe('parquet_read', elapsed, league)
+
+
+def ingest_source(source, league='', peak_rss=None):
+    source_path, table_name, create_db, check_db, columns = source
+    fingerprint = source_fingerprint(source_path)
+    match_ids = None
+    if config.INGEST_INCREMENTAL and table_name == f"{league}_events":
+        match_ids = new_match_ids(source_path, league)
+        if match_ids == []:
+            # The file changed but adds no match: it edits loaded matches, which an append would drop.
+            logger.warning(f'  {source_path} changed without adding matches, rebuilding {table_name}')
+            match_ids = None
+            create_db = lambda data: create_events_db(data, league, replace=True)
+    if match_ids is not None:
+        # Already loaded league: only the matches missing from the watermarks are read and appended.
+        logger.info(f'  {len(match_ids)} new matches in {source_path}')
+        create_db = lambda data: append_events_db(data, league, match_ids)
+    batches = read_parquet_batches(source_path, columns, league=league, match_ids=match_ids,
+                                   on_batch=peak_rss.sample if peak_rss is not None else None)
+    Loader._timed_ingest(league, table_name, create_db, batches)
+    saved_amount = check_db()
+    update_manifest(source_path, table_name, fingerprint, saved_amount)
+    logger.info(f'  Loaded and saved {saved_amount} rows into {table_name}')
+    return saved_amount
+
+
+class PeakRss:
+    """Highest resident set size (bytes) of this process seen by sample()."""
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self.peak = 0
+        self.sample()
+
+    def sample(self):
+        self.peak = max(self.peak, self._process.memory_info().rss)
+        return self.peak
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    return stat.st_size, stat.st_mtime, _file_sha256(source_path)
+
+
+def get_data_version(league):
+    # Changes whenever any source of the league is re-ingested (or, for parquet, rewritten).
+    if config.STORAGE_BACKEND == 'parquet':
+        parts = [f'{os.stat(path).st_size}:{os.stat(path).st_mtime}' for path, *_ in league_sources(league)]
+    else:
+        entries = [get_manifest_entry(path) for path, *_ in league_sources(league)]
+        parts = [entry['sha256'] if entry else '' for entry in entries]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+MANIFEST_TABLE_QUERY = 'CREATE TABLE IF NOT EXISTS ingest_manifest ( \
+           source_path        TEXT UNIQUE NOT NULL PRIMARY KEY, \
+           table_name         TEXT NOT NULL, \
+           size               INTEGER NOT NULL, \
+           mtime              REAL NOT NULL, \
+           sha256             TEXT NOT NULL, \
+           rows_amount        INTEGER NOT NULL, \
+           loaded_at          TEXT NOT NULL \
        );'
-    cur_data.execute(query)
 
-    for id, name, position, goals, points, goalsdiff in zip(data.teamId, data.teamName,
-                                                            data.position, data.goals,
-                                                            data.points, data.goalsDiff ):
-        query = f'INSERT OR IGNORE INTO {league} (id, team_name, position, ' \
-                f'goals, points, goalsDiff) VALUES ( ?,?,?,?,?,?)'
-        params = (id, name, position, goals, points, goalsdiff)
-        cur_data.execute(query, params)
 
-    conn_data.commit()
-    conn_data.close()
+def get_manifest_entry(source_path):
+    with db_pool.read() as conn_data:
+        if not _table_exists(conn_data, 'ingest_manifest'):
+            return None
+        query = 'SELECT table_name, size, mtime, sha256, rows_amount, loaded_at ' \
+                'FROM ingest_manifest WHERE source_path=?'
+        result = conn_data.execute(query, (source_path,)).fetchone()
+    if result is None:
+        return None
+    return dict(zip(['table_name', 'size', 'mtime', 'sha256', 'rows_amount', 'loaded_at'], result))
 
 
-def create_events_db(data, league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    league = f"{league}_events"
-    team_league = f"{league}_teams"
-    query = f'CREATE TABLE IF NOT EXISTS {league} ( \
+def update_manifest(source_path, table_name, fingerprint, rows_amount):
+    size, mtime, sha256 = fingerprint
+    with db_pool.write() as conn_data:
+        conn_data.execute(MANIFEST_TABLE_QUERY)
+        query = 'INSERT OR REPLACE INTO ingest_manifest (source_path, table_name, size, mtime, ' \
+                'sha256, rows_amount, loaded_at) VALUES (?,?,?,?,?,?,?)'
+        conn_data.execute(query, (source_path, table_name, size, mtime, sha256, rows_amount,
+                                  dt.now().isoformat()))
+
+
+def is_source_loaded(source_path, table_name):
+    entry = get_manifest_entry(source_path)
+    if entry is None or entry['table_name'] != table_name:
+        return False
+    stat = os.stat(source_path)
+    if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+        return True
+    # Touched but possibly identical file (copied, re-synced): fall back to the content hash.
+    if stat.st_size != entry['size']:
+        return False
+    fingerprint = source_fingerprint(source_path)
+    if fingerprint[2] != entry['sha256']:
+        return False
+    update_manifest(source_path, table_name, fingerprint, entry['rows_amount'])
+    return True
+
+
+INGEST_PRAGMAS = (
+    'PRAGMA synchronous=OFF',
+    f'PRAGMA cache_size=-{config.INGEST_CACHE_SIZE_KB}',
+    'PRAGMA temp_store=MEMORY',
+)
+
+# Indexes read by the rollup refresh (see explain_statistic_queries): the scorer/assistant
+# searches, in the compact layout a covering scan for the per-team-and-match counters (the wide
+# layout scans the table for them), and matchId lookups that keep the incremental refresh to the
+# appended matches.
+EVENTS_INDEXES = {
+    'wide': {
+        'goals': "(eventName, goal, playerId, teamId)",
+        'assists': "(eventName, assist, playerId, teamId)",
+        'match': "(matchId)",
+    },
+    'compact': {
+        'event_team': "(eventTypeId, teamId, matchId, flags)",
+        'event_player': "(eventTypeId, playerId, teamId, flags)",
+        'match': "(matchId)",
+    },
+}
+RETIRED_EVENTS_INDEXES = ('player', 'team')
+ALL_EVENTS_INDEXES = set(RETIRED_EVENTS_INDEXES).union(*EVENTS_INDEXES.values())
+
+# Bits of the compact layout's flags column.
+EVENT_FLAGS = {'accurate': 1, 'goal': 2, 'assist': 4, 'keyPass': 8}
+# Seeded in this order so every database (and every ingest shard) gives the common Wyscout
+# event types the same ids; names outside the list are appended on first sight.
+EVENT_TYPES = ['Pass', 'Duel', 'Others on the ball', 'Free Kick', 'Interruption', 'Foul', 'Shot',
+               'Save attempt', 'Offside', 'Goalkeeper leaving line']
+
+
+def _events_table_query(table, layout, team_table):
+    if layout == 'compact':
+        return f'CREATE TABLE IF NOT EXISTS {table} ( \
+               id              INTEGER NOT NULL PRIMARY KEY, \
+               matchId            INTEGER NOT NULL, \
+               eventSec               REAL,\
+               eventTypeId            INTEGER NOT NULL REFERENCES event_types(id), \
+               teamId               INTEGER NOT NULL, \
+               playerId               INTEGER, \
+               flags                INTEGER NOT NULL, \
+               FOREIGN KEY(teamId) REFERENCES  {team_table}(id) \
+           );'
+    return f'CREATE TABLE IF NOT EXISTS {table} ( \
            id              INTEGER UNIQUE NOT NULL PRIMARY KEY, \
            matchId            INTEGER NOT NULL, \
            eventSec               REAL,\
@@ -96,179 +898,704 @@ def create_events_db(data, league):
            goal                BOOLEAN, \
            assist               BOOLEAN,\
            keyPass             BOOLEAN,\
-           FOREIGN KEY(teamId) REFERENCES  {team_league}(id) \
+           FOREIGN KEY(teamId) REFERENCES  {team_table}(id) \
+       );'
+
+
+def _events_layout(conn_data, table, default=None):
+    columns = {row[1] for row in conn_data.execute(f'PRAGMA table_info({table})').fetchall()}
+    if not columns:
+        return default or config.EVENTS_SCHEMA
+    return 'compact' if 'flags' in columns else 'wide'
+
+
+def events_layout(league):
+    with db_pool.read() as conn_data:
+        return _events_layout(conn_data, f"{league}_events")
+
+
+def _event_is(layout, event_name):
+    if layout == 'compact':
+        return f"eventTypeId=(select id from event_types where name='{event_name}')"
+    return f"eventName='{event_name}'"
+
+
+def _event_flag(layout, flag):
+    if layout == 'compact':
+        return f'(flags & {EVENT_FLAGS[flag]} != 0)'
+    return f'{flag}=1'
+
+
+def _event_flag_value(layout, flag):
+    # 0/1 value of a flag; the wide layout's flag columns are nullable and NULL counts as 0.
+    if layout == 'compact':
+        return _event_flag(layout, flag)
+    return f'coalesce({_event_flag(layout, flag)}, 0)'
+
+
+def _event_type_ids(cur_data, names=()):
+    cur_data.execute('CREATE TABLE IF NOT EXISTS event_types ( \
+           id              INTEGER NOT NULL PRIMARY KEY, \
+           name            TEXT UNIQUE NOT NULL \
+       );')
+    new_names = EVENT_TYPES + sorted(set(names) - set(EVENT_TYPES))
+    cur_data.executemany('INSERT OR IGNORE INTO event_types (name) VALUES (?)', [(name,) for name in new_names])
+    return dict(cur_data.execute('SELECT name, id FROM event_types').fetchall())
+
+
+def _insert_rows(cur_data, query, rows, batch_size=config.INGEST_BATCH_SIZE):
+    rows = iter(rows)
+    inserted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return inserted
+        cur_data.executemany(query, batch)
+        inserted += len(batch)
+
+
+def _drop_indexes(cur_data, table, indexes):
+    for name in indexes:
+        cur_data.execute(f'DROP INDEX IF EXISTS idx_{table}_{name}')
+
+
+def _create_indexes(cur_data, table, indexes):
+    for name, columns in indexes.items():
+        cur_data.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} {columns}')
+    cur_data.execute(f'ANALYZE {table}')
+
+
+def ensure_events_indexes(league):
+    # Databases loaded before an index was added or retired are skipped by the manifest, so fix them up here.
+    league = f"{league}_events"
+    with db_pool.read() as conn_data:
+        if not _table_exists(conn_data, league):
+            return False
+        indexes = EVENTS_INDEXES[_events_layout(conn_data, league)]
+        query = 'SELECT name FROM sqlite_master WHERE type="index" AND tbl_name=?'
+        existing = {name for name, in conn_data.execute(query, (league,)).fetchall()}
+    stale = {f'idx_{league}_{name}' for name in set(ALL_EVENTS_INDEXES) - set(indexes)} & existing
+    if {f'idx_{league}_{name}' for name in indexes} <= existing and not stale:
+        return False
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        _drop_indexes(cur_data, league, set(ALL_EVENTS_INDEXES) - set(indexes))
+        _create_indexes(cur_data, league, indexes)
+    logger.info(f'  Built missing indexes for {league}')
+    return True
+
+
+def _rollup_tables(league):
+    return f"{league}_team_match_stats", f"{league}_player_stats"
+
+
+def refresh_rollups(cur_data, league, delta_matches=None):
+    # Materialized per-league aggregates the statistic queries read instead of the raw event log.
+    # With delta_matches (a table of matchIds just appended) only those matches are folded in.
+    team_match_stats, player_stats = _rollup_tables(league)
+    cur_data.execute(f'CREATE TABLE IF NOT EXISTS {team_match_stats} ( \
+           eventName          TEXT NOT NULL, \
+           teamId             INTEGER NOT NULL, \
+           matchId            INTEGER NOT NULL, \
+           events_amount      INTEGER NOT NULL, \
+           accurate_amount    INTEGER NOT NULL, \
+           goals_amount       INTEGER NOT NULL, \
+           assists_amount     INTEGER NOT NULL, \
+           PRIMARY KEY (eventName, teamId, matchId) \
+       ) WITHOUT ROWID;')
+    cur_data.execute(f'CREATE TABLE IF NOT EXISTS {player_stats} ( \
+           playerId           INTEGER NOT NULL PRIMARY KEY, \
+           teamId             INTEGER NOT NULL, \
+           goals              INTEGER NOT NULL, \
+           assists            INTEGER NOT NULL \
+       );')
+    if delta_matches is None:
+        cur_data.execute(f'DELETE FROM {team_match_stats}')
+        cur_data.execute(f'DELETE FROM {player_stats}')
+    for query in _rollup_queries(cur_data, league, delta_matches).values():
+        cur_data.execute(query)
+    _record_watermarks(cur_data, league, replace=delta_matches is None)
+    refresh_league_views(cur_data)
+    with metrics.timed('build_timeline', league):
+        refresh_timeline(cur_data, league, delta_matches)
+
+
+def _ensure_match_index(cur_data, league_events, layout):
+    # Tables loaded before the matchId index existed get it here: the delta refresh and the
+    # timeline build read through it.
+    cur_data.execute(f'CREATE INDEX IF NOT EXISTS idx_{league_events}_match ON {league_events} '
+                     f'{EVENTS_INDEXES[layout]["match"]}')
+
+
+def _events_scope(league, delta_matches=None):
+    # FROM clause over the whole events table, or over the delta_matches ones only: CROSS JOIN keeps
+    # delta_matches as the outer loop and INDEXED BY stops SQLite from building an automatic index
+    # over the whole table instead of looking each match up.
+    league_events = f"{league}_events"
+    if delta_matches is None:
+        return league_events
+    return f'{delta_matches} CROSS JOIN {league_events} INDEXED BY idx_{league_events}_match USING (matchId)'
+
+
+def _rollup_queries(conn_data, league, delta_matches=None):
+    # With delta_matches the player totals of those matches are added to the existing rows.
+    league_events = f"{league}_events"
+    events = _events_scope(league, delta_matches)
+    team_match_stats, player_stats = _rollup_tables(league)
+    layout = _events_layout(conn_data, league_events)
+    if layout == 'compact':
+        event_name, event_key = '(select name from event_types where id=eventTypeId)', 'eventTypeId'
+    else:
+        event_name, event_key = 'eventName', 'eventName'
+    team_events = events
+    if layout == 'wide' and delta_matches is None:
+        # No wide index covers the per-team-and-match counters; scanning one of the goals/assists
+        # indexes would look every row up in the table, which is slower than scanning the table.
+        team_events = f'{league_events} NOT INDEXED'
+    accurate, goal, assist = (_event_flag_value(layout, flag) for flag in ('accurate', 'goal', 'assist'))
+    is_goal = f"{_event_is(layout, 'Shot')} AND {_event_flag(layout, 'goal')}"
+    is_assist = f"{_event_is(layout, 'Pass')} AND {_event_flag(layout, 'assist')}"
+    on_conflict = 'ON CONFLICT(playerId) DO UPDATE SET teamId=max(teamId, excluded.teamId), ' \
+                  'goals=goals + excluded.goals, assists=assists + excluded.assists' if delta_matches else ''
+    return {
+        'team_match_stats': f'INSERT OR REPLACE INTO {team_match_stats} (eventName, teamId, matchId, events_amount, '
+                            f'accurate_amount, goals_amount, assists_amount) '
+                            f'SELECT {event_name}, teamId, matchId, count(*), sum({accurate}), sum({goal}), '
+                            f'sum({assist}) FROM {team_events} GROUP BY {event_key}, teamId, matchId',
+        'player_stats': f'INSERT INTO {player_stats} (playerId, teamId, goals, assists) '
+                        f'SELECT playerId, max(teamId), sum({is_goal}), sum({is_assist}) FROM {events} '
+                        f'WHERE ({is_goal}) OR ({is_assist}) GROUP BY playerId {on_conflict}',
+    }
+
+
+TIMELINE_TABLE_QUERY = 'CREATE TABLE IF NOT EXISTS timeline_cubes ( \
+           league             TEXT NOT NULL PRIMARY KEY, \
+           cube               BLOB NOT NULL \
        );'
-    cur_data.execute(query)
-    for id, match_id, eventSec, eventName,\
-        teamId, playerId, playerName, accurate, goal, assist, keyPass in zip(data.id, data.matchId, data.eventSec,
-                                                                             data.eventName, data.teamId,
-                                                                             data.playerId, data.playerName,
-                                                                             data.accurate, data.goal, data.assist,
-                                                                             data.keyPass):
-        query = f'INSERT OR IGNORE INTO {league} (id, matchId, eventSec, ' \
+
+
+def refresh_timeline(cur_data, league, delta_matches=None, batch_size=config.INGEST_BATCH_SIZE):
+    # Per-minute counters of the league (or of the delta_matches merged into the stored cube),
+    # serialized next to the data they come from. Events are read in batches of whole matches.
+    league_events = f"{league}_events"
+    layout = _events_layout(cur_data, league_events)
+    _ensure_match_index(cur_data, league_events, layout)
+    event_name = '(select name from event_types where id=eventTypeId)' if layout == 'compact' else 'eventName'
+    events = _events_scope(league, delta_matches)
+    if delta_matches is None:
+        # Read in matchId index order, so the ORDER BY needs no sort of the whole table.
+        events = f'{league_events} INDEXED BY idx_{league_events}_match'
+    cur_data.execute(f'SELECT id, matchId, teamId, {event_name}, eventSec, {_event_flag_value(layout, "accurate")}, '
+                     f'{_event_flag_value(layout, "goal")} FROM {events} ORDER BY matchId, id')
+    cube = timeline.TimelineCube.empty()
+    for matches in _whole_matches(cur_data, batch_size):
+        cube = cube.merge(timeline.TimelineCube.from_events(matches))
+    cur_data.execute(TIMELINE_TABLE_QUERY)
+    if delta_matches is not None:
+        row = cur_data.execute('SELECT cube FROM timeline_cubes WHERE league=?', (league,)).fetchone()
+        if row is not None:
+            cube = timeline.TimelineCube.from_bytes(row[0]).merge(cube)
+    cur_data.execute('INSERT OR REPLACE INTO timeline_cubes (league, cube) VALUES (?, ?)', (league, cube.to_bytes()))
+    return cube
+
+
+def _whole_matches(cursor, batch_size):
+    # Frames of the rows of an ORDER BY matchId query, each ending on a match boundary.
+    pending = None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=timeline.EVENT_COLUMNS)
+        if pending is not None:
+            frame = pd.concat([pending, frame], ignore_index=True)
+        complete = (frame.matchId != frame.matchId.iat[-1]).to_numpy()
+        if complete.any():
+            yield frame[complete]
+        pending = frame[~complete]
+    if pending is not None and len(pending):
+        yield pending
+
+
+# Cross-league views -> the per-league table each one unions.
+LEAGUE_VIEWS = {
+    'all_teams': '{league}_teams',
+    'all_team_match_stats': '{league}_team_match_stats',
+    'all_player_stats': '{league}_player_stats',
+}
+
+
+def refresh_league_views(cur_data):
+    # Leagues stay partitioned one table per league, so per-league queries and rebuilds are unchanged;
+    # these UNION ALL views put every partition behind one relation keyed by a league column and are
+    # what the cross-league queries read. Recreated only when the set of leagues changes.
+    query = "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%\\_player\\_stats' ESCAPE '\\'"
+    leagues = sorted(name[:-len('_player_stats')] for name, in cur_data.execute(query).fetchall())
+    leagues = [league for league in leagues if _table_exists(cur_data, f"{league}_teams")]
+    for view, table in LEAGUE_VIEWS.items():
+        definition = f'CREATE VIEW {view} AS {_league_partitions(table, leagues)}' if leagues else None
+        existing = cur_data.execute("SELECT sql FROM sqlite_master WHERE type='view' AND name=?", (view,)).fetchone()
+        if (existing[0] if existing else None) == definition:
+            continue
+        cur_data.execute(f'DROP VIEW IF EXISTS {view}')
+        if definition:
+            cur_data.execute(definition)
+    return leagues
+
+
+def _league_views_include(conn_data, league):
+    query = "SELECT count(*) FROM sqlite_master WHERE type='view' AND name IN ({}) AND sql LIKE ?".format(
+        ', '.join('?' * len(LEAGUE_VIEWS)))
+    return conn_data.execute(query, (*LEAGUE_VIEWS, f"%'{league}' AS league%")).fetchone()[0] == len(LEAGUE_VIEWS)
+
+
+def _league_partitions(table, leagues):
+    return ' UNION ALL '.join(f"SELECT '{league}' AS league, * FROM {table.format(league=league)}"
+                              for league in leagues)
+
+
+WATERMARKS_TABLE_QUERY = 'CREATE TABLE IF NOT EXISTS ingest_watermarks ( \
+           league             TEXT NOT NULL, \
+           matchId            INTEGER NOT NULL, \
+           PRIMARY KEY (league, matchId) \
+       ) WITHOUT ROWID;'
+
+
+def _record_watermarks(cur_data, league, replace=False):
+    # Every match with events in the rollup is loaded; incremental ingest skips these matchIds.
+    team_match_stats, _ = _rollup_tables(league)
+    cur_data.execute(WATERMARKS_TABLE_QUERY)
+    if replace:
+        cur_data.execute('DELETE FROM ingest_watermarks WHERE league=?', (league,))
+    cur_data.execute(f'INSERT OR IGNORE INTO ingest_watermarks (league, matchId) '
+                     f'SELECT DISTINCT ?, matchId FROM {team_match_stats}', (league,))
+
+
+def loaded_match_ids(league):
+    with db_pool.read() as conn_data:
+        if not _table_exists(conn_data, 'ingest_watermarks'):
+            return set()
+        query = 'SELECT matchId FROM ingest_watermarks WHERE league=?'
+        return {match_id for match_id, in conn_data.execute(query, (league,)).fetchall()}
+
+
+def new_match_ids(source_path, league):
+    """matchIds in the events file that are not loaded yet, or None when the league has nothing loaded."""
+    loaded = loaded_match_ids(league)
+    if not loaded:
+        return None
+    match_ids = pq.read_table(source_path, columns=['matchId']).column('matchId').unique().to_pylist()
+    return sorted(set(match_ids) - loaded)
+
+
+def append_events_db(data, league, match_ids, batch_size=config.INGEST_BATCH_SIZE):
+    """Appends the events of new matches and folds only those matches into the rollups."""
+    league_name = league
+    league = f"{league}_events"
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        layout = _events_layout(cur_data, league)
+        # The indexes stay in place: maintaining them for a few matches is cheaper than a rebuild.
+        _ensure_match_index(cur_data, league, layout)
+        inserted = _insert_events(cur_data, league, layout, data, batch_size)
+        cur_data.execute('CREATE TEMP TABLE IF NOT EXISTS delta_matches (matchId INTEGER PRIMARY KEY)')
+        cur_data.execute('DELETE FROM delta_matches')
+        cur_data.executemany('INSERT INTO delta_matches (matchId) VALUES (?)', [(match_id,) for match_id in match_ids])
+        with metrics.timed('refresh_rollups', league_name):
+            refresh_rollups(cur_data, league_name, delta_matches='temp.delta_matches')
+        cur_data.execute('DROP TABLE temp.delta_matches')
+    return inserted
+
+
+def ensure_rollups(league):
+    with db_pool.read() as conn_data:
+        if not _table_exists(conn_data, f"{league}_events"):
+            return False
+        if all(_table_exists(conn_data, table) for table in _rollup_tables(league)) and \
+                _table_exists(conn_data, 'timeline_cubes') and \
+                conn_data.execute('SELECT 1 FROM timeline_cubes WHERE league=?', (league,)).fetchone():
+            if _league_views_include(conn_data, league):
+                return False
+            views_only = True
+        else:
+            views_only = False
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        if views_only:
+            # Loaded before the cross-league views existed: the rollups are fine, only the views are missing.
+            refresh_league_views(conn_data.cursor())
+            return True
+        refresh_rollups(conn_data.cursor(), league)
+    logger.info(f'  Built summary tables for {league}')
+    return True
+
+def _frames(data):
+    # create_*_db take either one DataFrame or an iterable of batches (see read_parquet_batches).
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def create_teams_db(data, league, batch_size=config.INGEST_BATCH_SIZE):
+    _team_names_cache.invalidate(lambda key: key[0] == league)
+    league = f"{league}_teams"
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        query = f'CREATE TABLE IF NOT EXISTS {league} ( \
+               id              INTEGER UNIQUE NOT NULL PRIMARY KEY, \
+               team_name            TEXT NOT NULL, \
+               position               INTEGER,\
+               goals               INTEGER, \
+               points               INTEGER, \
+               goalsDiff               INTEGER \
+           );'
+        cur_data.execute(query)
+
+        query = f'INSERT OR IGNORE INTO {league} (id, team_name, position, ' \
+                f'goals, points, goalsDiff) VALUES ( ?,?,?,?,?,?)'
+        inserted = 0
+        for frame in _frames(data):
+            rows = zip(frame.teamId, frame.teamName, frame.position, frame.goals, frame.points, frame.goalsDiff)
+            inserted += _insert_rows(cur_data, query, rows, batch_size)
+    return inserted
+
+
+def create_events_db(data, league, batch_size=config.INGEST_BATCH_SIZE, build_derived=True, layout=None,
+                     replace=False):
+    # With replace the loaded events are deleted first, so rows of the same id are re-read, not ignored.
+    league_name = league
+    league = f"{league}_events"
+    team_league = f"{league}_teams"
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        # An existing table keeps its layout; migrate_events_schema converts it explicitly.
+        layout = _events_layout(cur_data, league, default=layout)
+        cur_data.execute(_events_table_query(league, layout, team_league))
+        # Secondary indexes are rebuilt once after the load instead of being maintained row by row.
+        _drop_indexes(cur_data, league, ALL_EVENTS_INDEXES)
+        if replace:
+            cur_data.execute(f'DELETE FROM {league}')
+        inserted = _insert_events(cur_data, league, layout, data, batch_size)
+        if build_derived:
+            with metrics.timed('build_indexes', league_name):
+                _create_indexes(cur_data, league, EVENTS_INDEXES[layout])
+            with metrics.timed('refresh_rollups', league_name):
+                refresh_rollups(cur_data, league_name)
+    return inserted
+
+
+def _insert_events(cur_data, table, layout, data, batch_size):
+    if layout == 'compact':
+        query = f'INSERT OR IGNORE INTO {table} (id, matchId, eventSec, ' \
+                f'eventTypeId, teamId, playerId, flags) VALUES ( ?,?,?,?,?,?,?)'
+    else:
+        query = f'INSERT OR IGNORE INTO {table} (id, matchId, eventSec, ' \
                 f'eventName, teamId, playerId,playerName, accurate, goal, assist, keyPass) ' \
                 f'VALUES ( ?,?,?,?,?,?,?,?,?,?,?)'
-        params = (id, match_id, eventSec, eventName,
-                  teamId, playerId, playerName,  accurate,
-                  goal, assist, keyPass)
-        cur_data.execute(query, params)
+    inserted = 0
+    for frame in _frames(data):
+        if layout == 'compact':
+            type_ids = _event_type_ids(cur_data, frame.eventName.unique())
+            flags = sum(frame[flag].fillna(False).astype(bool).astype('int64') * bit
+                        for flag, bit in EVENT_FLAGS.items())
+            rows = zip(frame.id, frame.matchId, frame.eventSec, frame.eventName.map(type_ids), frame.teamId,
+                       frame.playerId, flags)
+        else:
+            rows = zip(frame.id, frame.matchId, frame.eventSec, frame.eventName, frame.teamId,
+                       frame.playerId, frame.playerName, frame.accurate, frame.goal, frame.assist,
+                       frame.keyPass)
+        inserted += _insert_rows(cur_data, query, rows, batch_size)
+    return inserted
 
-    conn_data.commit()
-    conn_data.close()
 
+def migrate_events_schema(league, layout='compact', vacuum=True):
+    """Rewrites {league}_events in place into the given layout; returns False if there was nothing to do."""
+    table = f"{league}_events"
+    migrated = f"{table}_migrated"
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        if not _table_exists(cur_data, table) or _events_layout(cur_data, table) == layout:
+            return False
+        cur_data.execute(f'DROP TABLE IF EXISTS {migrated}')
+        cur_data.execute(_events_table_query(migrated, layout, f"{table}_teams"))
+        if layout == 'compact':
+            _event_type_ids(cur_data, [name for name, in cur_data.execute(f'SELECT DISTINCT eventName FROM {table}')])
+            flags = ' + '.join(f'(coalesce({flag}, 0) != 0) * {bit}' for flag, bit in EVENT_FLAGS.items())
+            cur_data.execute(f'INSERT INTO {migrated} (id, matchId, eventSec, eventTypeId, teamId, playerId, flags) '
+                             f'SELECT {table}.id, matchId, eventSec, event_types.id, teamId, playerId, {flags} '
+                             f'FROM {table} JOIN event_types ON event_types.name = {table}.eventName')
+        else:
+            flags = ', '.join(f'(flags & {bit} != 0)' for bit in EVENT_FLAGS.values())
+            cur_data.execute(f'INSERT INTO {migrated} (id, matchId, eventSec, eventName, teamId, playerId, '
+                             f'playerName, accurate, goal, assist, keyPass) '
+                             f"SELECT {table}.id, matchId, eventSec, event_types.name, teamId, playerId, "
+                             f"coalesce(players.player_name, ''), {flags} FROM {table} "
+                             f'JOIN event_types ON event_types.id = {table}.eventTypeId '
+                             f'LEFT JOIN players ON players.id = {table}.playerId')
+        cur_data.execute(f'DROP TABLE {table}')
+        cur_data.execute(f'ALTER TABLE {migrated} RENAME TO {table}')
+        _create_indexes(cur_data, table, EVENTS_INDEXES[layout])
+        refresh_rollups(cur_data, league)
+    if vacuum:
+        with db_pool.write() as conn_data:
+            conn_data.execute('VACUUM')
+    logger.info(f'  Migrated {table} to the {layout} layout')
+    return True
+
+
+def create_players_db(data, batch_size=config.INGEST_BATCH_SIZE):
+    with db_pool.write(INGEST_PRAGMAS) as conn_data:
+        cur_data = conn_data.cursor()
+        query = f'CREATE TABLE IF NOT EXISTS players ( \
+               id              INTEGER UNIQUE NOT NULL PRIMARY KEY, \
+               strong_foot            TEXT NOT NULL, \
+               player_name               TEXT NOT NULL,\
+               player_position               TEXT NOT NULL \
+           );'
+        cur_data.execute(query)
 
-def create_players_db(data):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query = f'CREATE TABLE IF NOT EXISTS players ( \
-           id              INTEGER UNIQUE NOT NULL PRIMARY KEY, \
-           strong_foot            TEXT NOT NULL, \
-           player_name               TEXT NOT NULL,\
-           player_position               TEXT NOT NULL \
-       );'
-    cur_data.execute(query)
-    for player_id, strong_foot, player_name, player_position in zip(data.playerId, data.playerStrongFoot,
-                                                                   data.playerName, data.playerPosition):
         query = f'INSERT OR IGNORE INTO players (id, strong_foot, player_name, ' \
                 f'player_position) VALUES ( ?,?,?,?)'
-        params = (player_id, strong_foot, player_name, player_position)
-        cur_data.execute(query, params)
+        inserted = 0
+        for frame in _frames(data):
+            rows = zip(frame.playerId, frame.playerStrongFoot, frame.playerName, frame.playerPosition)
+            inserted += _insert_rows(cur_data, query, rows, batch_size)
+    return inserted
+
+
+def _best_players_query(player_stats, amount_column):
+    return f'select players.id , players.player_name, {amount_column}, teamId' \
+           f' from {player_stats} join players on {player_stats}.playerId = players.id' \
+           f' where {amount_column} > 0 order by {amount_column} desc limit 20;'
+
+
+def _teams_graph_query(league_teams):
+    return f"select team_name, position, points, goals from {league_teams} order by position;"
+
+
+# Per-team metrics computed by compute_teams_statistic:
+# (total column, per-match column, per-match decimals, eventName, event flag).
+TEAM_METRICS = [
+    ('accurate_pass_amount', 'accurate_passes_per_match', 0, 'Pass', 'accurate'),
+    ('accurate_shots_amount', 'accurate_shots_per_match', 0, 'Shot', 'accurate'),
+    ('goals_amount', 'goals_per_match', 2, 'Shot', 'goal'),
+    ('assists_amount', 'assists_per_match', 2, 'Pass', 'assist'),
+]
+# Event flag -> matching counter column of the {league}_team_match_stats rollup.
+ROLLUP_FLAG_COLUMNS = {'accurate': 'accurate_amount', 'goal': 'goals_amount', 'assist': 'assists_amount'}
+
+
+def _metric_amounts(metrics):
+    # One conditional sum over the team_match_stats rollup per metric.
+    return ', '.join(f"sum(case when eventName='{event_name}' then {ROLLUP_FLAG_COLUMNS[flag]} else 0 end)"
+                     for _, _, _, event_name, flag in metrics)
+
+
+def _team_statistic_query(team_match_stats, league_teams, metrics):
+    amounts = _metric_amounts(metrics)
+    return f'select teamId, position, points, goals, {league_teams}.team_name, {amounts}, ' \
+           f'count(distinct(matchId)) from {team_match_stats} ' \
+           f'join {league_teams} on {league_teams}.id = {team_match_stats}.teamId group by teamId;'
+
+
+# Cross-league leaderboards: rollup column and the amount column name of the result frame.
+LEADERBOARDS = {
+    'scorers': ('goals', 'goals_amount'),
+    'assistants': ('assists', 'assist_amount'),
+}
+
+
+# The cross-league queries read the all_* views; the constant league filter is pushed into every
+# UNION ALL arm, so the partitions of leagues that were not asked for are skipped without a scan.
+def _leagues_in(column, leagues):
+    return f"{column} IN ({', '.join('?' * len(leagues))})"
+
+
+def _leaderboard_query(leagues, stats_column):
+    # The top rows are picked from all_player_stats first; names are joined to those rows only.
+    return f'with top as (select league, playerId, teamId, {stats_column} from all_player_stats ' \
+           f'where {_leagues_in("league", leagues)} and {stats_column} > 0 ' \
+           f'order by {stats_column} desc, league, playerId limit ?) ' \
+           f'select top.league, players.id, players.player_name, top.{stats_column}, top.teamId, teams.team_name ' \
+           f'from top join players on top.playerId = players.id ' \
+           f'left join all_teams as teams on teams.league = top.league and teams.id = top.teamId ' \
+           f'order by top.{stats_column} desc, top.league, top.playerId;'
+
+
+def _team_comparison_query(leagues, metrics):
+    # Aggregated per team before the join, so only the totals are matched against all_teams.
+    columns = ', '.join(metric[0] for metric in metrics)
+    return f'with totals (league, teamId, {columns}, match_amount) as (' \
+           f'select league, teamId, {_metric_amounts(metrics)}, count(distinct(matchId)) ' \
+           f'from all_team_match_stats where {_leagues_in("league", leagues)} group by league, teamId) ' \
+           f'select totals.league, teamId, position, points, goals, team_name, {columns}, match_amount ' \
+           f'from totals join all_teams as teams on teams.league = totals.league and teams.id = totals.teamId;'
+
 
-    conn_data.commit()
-    conn_data.close()
+@backend_dispatch
+def get_leaderboard(leagues, kind='scorers', limit=20):
+    """Top players of several leagues from one query; kind is a LEADERBOARDS key."""
+    stats_column, amount_column = LEADERBOARDS[kind]
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(_leaderboard_query(leagues, stats_column), (*leagues, limit)).fetchall()
+    return pd.DataFrame(result, columns=['league', 'player_id', 'player_name', amount_column, 'team_id', 'team_name'])
 
 
+@backend_dispatch
+def team_comparison_totals(leagues, metrics):
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(_team_comparison_query(leagues, metrics), leagues).fetchall()
+    return pd.DataFrame(result, columns=['league', 'id', 'position', 'points', 'goals', 'team_name'] +
+                                        [metric[0] for metric in metrics] + ['match_amount'])
+
+
+def compare_teams(leagues, metrics=TEAM_METRICS):
+    # Same per-match columns as compute_teams_statistic, for every team of the given leagues.
+    return _per_match(team_comparison_totals(leagues, metrics), metrics)
+
+
+def statistic_queries(league):
+    league_teams = f"{league}_teams"
+    team_match_stats, player_stats = _rollup_tables(league)
+    return {
+        'teams_graph': _teams_graph_query(league_teams),
+        'team_statistic': _team_statistic_query(team_match_stats, league_teams, TEAM_METRICS),
+        'best_scorers': _best_players_query(player_stats, 'goals'),
+        'best_assistants': _best_players_query(player_stats, 'assists'),
+    }
+
+
+def explain_statistic_queries(league):
+    plans = {}
+    with db_pool.read() as conn_data:
+        queries = statistic_queries(league)
+        # The rollup refresh is what still scans {league}_events; its plans show which indexes it uses.
+        queries.update({f'rollup_{name}': query for name, query in _rollup_queries(conn_data, league).items()})
+        for name, query in queries.items():
+            plans[name] = [row[-1] for row in conn_data.execute(f'EXPLAIN QUERY PLAN {query}').fetchall()]
+    return plans
+
+
+@backend_dispatch
 def get_best_scorers_data(league):
-    league = f"{league}_events"
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query =f'select players.id , players.player_name,  count(eventName) as shot_amount, teamId'\
-           f' from {league} join players on {league}.playerId = players.id' \
-           f' where eventName="Shot" and goal=1  group by players.id order by shot_amount desc limit 20;'
-    print(query)
-    result = cur_data.execute(query).fetchall()
+    query = _best_players_query(_rollup_tables(league)[1], 'goals')
+    logger.debug(query)
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(query).fetchall()
     data = pd.DataFrame(result, columns=['player_id', 'player_name', 'goals_amount', 'team_id'])
+    data['team_name'] = get_team_names_by_ids(data.team_id, league)
     return data
 
 
+@backend_dispatch
 def get_best_assistants_data(league):
-    league = f"{league}_events"
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query =f'select players.id , players.player_name,  count(eventName) as assist_amount, teamId'\
-           f' from {league} join players on {league}.playerId = players.id' \
-           f' where eventName="Pass" and assist=1  group by players.id order by assist_amount desc limit 20;'
-    print(query)
-    result = cur_data.execute(query).fetchall()
+    query = _best_players_query(_rollup_tables(league)[1], 'assists')
+    logger.debug(query)
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(query).fetchall()
     data = pd.DataFrame(result, columns=['player_id', 'player_name', 'assist_amount', 'team_id'])
+    data['team_name'] = get_team_names_by_ids(data.team_id, league)
     return data
 
 
+# (league, data version) -> {team id: team name}. The version follows re-ingests by any process;
+# create_teams_db also drops the league for writes the manifest has not recorded yet.
+_team_names_cache = ResultCache(maxsize=config.STATISTIC_CACHE_SIZE)
+
+
+@backend_dispatch
+def get_team_names(league):
+    key = (league, get_data_version(league))
+    team_names = _team_names_cache.get(key)
+    if team_names is None:
+        query = f"select id, team_name from {league}_teams;"
+        with db_pool.read() as conn_data:
+            team_names = dict(conn_data.execute(query).fetchall())
+        _team_names_cache.invalidate(lambda cached_key: cached_key[0] == league)
+        _team_names_cache.put(key, team_names)
+    return team_names
+
+
+def get_team_names_by_ids(ids, league):
+    team_names = get_team_names(league)
+    return [team_names.get(team_id) for team_id in ids]
+
+
 def get_team_name_by_id(id, league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    league = f"{league}_teams"
-    query = f"select team_name from {league} where id={id};"
-    result = cur_data.execute(query).fetchone()
-    return result
+    team_name = get_team_names(league).get(id)
+    if team_name is None:
+        return None
+    return (team_name,)
 
 
+@backend_dispatch
 def get_data_for_teams_graph(league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    league = f"{league}_teams"
-    query = f"select team_name, position, points, goals from {league} order by position;"
-    result = cur_data.execute(query).fetchall()
+    query = _teams_graph_query(f"{league}_teams")
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(query).fetchall()
     df = pd.DataFrame(result, columns=['team_name', 'position', 'points', 'goals'])
     return df
 
 
-#select players.id ,players.player_name,  count(eventName)  as shots_amount  from events_england join players on events_england.playerId = players.id where eventName="Shot" and accurate=1 group by players.id order by shots_amount desc ;
-def _compute_total_accurate_passes_amount(league_events, league_teams):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query = f'select teamId, position, points, goals, {league_teams}.team_name, ' \
-            f'count(accurate), count(distinct(matchId)) from {league_events} '\
-            f'join {league_teams} on {league_teams}.id = {league_events}.teamID  ' \
-            'where accurate=1 and eventName="Pass" group by teamId;'
-    result = cur_data.execute(query).fetchall()
-    data = pd.DataFrame(result, columns=['id', 'position', 'points', 'goals',
-                                         'team_name', 'accurate_pass_amount', 'match_amount'])
+@backend_dispatch
+def team_metric_totals(league, metrics):
+    query = _team_statistic_query(_rollup_tables(league)[0], f"{league}_teams", metrics)
+    with db_pool.read() as conn_data:
+        result = conn_data.execute(query).fetchall()
+    data = pd.DataFrame(result, columns=['id', 'position', 'points', 'goals', 'team_name'] +
+                                        [metric[0] for metric in metrics] + ['match_amount'])
     return data
 
 
-def _compute_total_accurate_shots_amount(league_events, league_teams):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query = f'select teamId, position, points, goals, {league_teams}.team_name, ' \
-            f'count(accurate), count(distinct(matchId)) from {league_events} '\
-            f'join {league_teams} on {league_teams}.id = {league_events}.teamID  ' \
-            'where accurate=1 and eventName="Shot" group by teamId;'
-    result = cur_data.execute(query).fetchall()
-    data = pd.DataFrame(result, columns=['id', 'position', 'points', 'goals',
-                                         'team_name', 'accurate_shots_amount', 'match_amount'])
+def compute_teams_statistic(league, metrics=TEAM_METRICS):
+    # One pass over the league grouped by team; every metric lands in the same row of the same frame.
+    return _per_match(team_metric_totals(league, metrics), metrics)
+
+
+def _per_match(data, metrics):
+    for amount_column, per_match_column, decimals, _, _ in metrics:
+        data[per_match_column] = np.round(data[amount_column] / data["match_amount"], decimals)
     return data
 
 
 def compute_teams_pass_statistic(league):
-    league_event = f"{league}_events"
-    league_teams = f"{league}_teams"
-    df_accurate_passes = _compute_total_accurate_passes_amount(league_event, league_teams)
-    df_accurate_passes["accurate_passes_per_match"] = np.round(df_accurate_passes["accurate_pass_amount"] /
-                                                               df_accurate_passes["match_amount"], 0)
-    df_accurate_passes.sort_values("accurate_passes_per_match", inplace=True)
-    return df_accurate_passes
+    return compute_teams_statistic(league).sort_values("accurate_passes_per_match")
 
 
 def compute_teams_shot_statistic(league):
-    league_event = f"{league}_events"
-    league_teams = f"{league}_teams"
-    df_accurate_shots = _compute_total_accurate_shots_amount(league_event, league_teams)
-    df_accurate_shots["accurate_shots_per_match"] = np.round(df_accurate_shots["accurate_shots_amount"] /
-                                                             df_accurate_shots["match_amount"], 0)
-    df_accurate_shots.sort_values("accurate_shots_per_match", inplace=True)
-    return df_accurate_shots
+    return compute_teams_statistic(league).sort_values("accurate_shots_per_match")
 
 
+# (league, data version) -> timeline.TimelineCube, decoded once per version.
+_timeline_cubes = ResultCache(maxsize=config.STATISTIC_CACHE_SIZE, sizeof=lambda cube: cube.nbytes)
+
+
+@backend_dispatch
+def get_timeline_cube(league):
+    key = (league, get_data_version(league))
+    cube = _timeline_cubes.get(key)
+    if cube is None:
+        with db_pool.read() as conn_data:
+            row = None
+            if _table_exists(conn_data, 'timeline_cubes'):
+                row = conn_data.execute('SELECT cube FROM timeline_cubes WHERE league=?', (league,)).fetchone()
+        cube = timeline.TimelineCube.from_bytes(row[0]) if row is not None else timeline.TimelineCube.empty()
+        _timeline_cubes.invalidate(lambda cached_key: cached_key[0] == league)
+        _timeline_cubes.put(key, cube)
+    return cube
+
+
+def _count_rows(table_name):
+    with db_pool.read() as conn_data:
+        if not _table_exists(conn_data, table_name):
+            return [0]
+        return conn_data.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()
+
 
 def check_teams_db(league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    table_name = f"{league}_teams"
-    params = (table_name,)
-    query = 'SELECT count(*) FROM sqlite_master WHERE type="table"  AND name=?'
-    ret = cur_data.execute(query, params).fetchone()
-    if not ret[0]:
-        return [0]
-    query = f'SELECT COUNT(*) FROM {table_name}'
-    ret = cur_data.execute(query).fetchone()
-    conn_data.close()
-    return ret
+    return _count_rows(f"{league}_teams")
 
 
 def check_events_db(league):
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    table_name = f"{league}_events"
-    params = (table_name,)
-    query = 'SELECT count(*) FROM sqlite_master WHERE type="table"  AND name=?'
-    ret = cur_data.execute(query, params).fetchone()
-    if not ret[0]:
-        return [0]
-    query = f'SELECT COUNT(*) FROM {table_name}'
-    ret = cur_data.execute(query).fetchone()
-    conn_data.close()
-    return ret
+    return _count_rows(f"{league}_events")
 
 
 def check_players_db():
-    conn_data = sqlite3.connect('databases/soccer_data.sqlite')
-    cur_data = conn_data.cursor()
-    query = 'SELECT count(*) FROM sqlite_master WHERE type="table"  AND name="players"'
-    ret = cur_data.execute(query).fetchone()
-    if not ret[0]:
-        return [0]
-    query = f'SELECT COUNT(*) FROM players'
-    ret = cur_data.execute(query).fetchone()
-    conn_data.close()
-    return ret
+    return _count_rows("players")
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging as logger
+
+import flask
+
+import config
+from app import get_registry
+
+
+class Warmup:
+    """Fills the registry and the figure cache for every league of the given pages in the background."""
+
+    def __init__(self, pages, workers=config.WARMUP_WORKERS):
+        self.pages = pages
+        self.workers = workers
+        self.leagues = []
+        for page in pages:
+            for league in page.league_tab_mapping.values():
+                if league not in self.leagues:
+                    self.leagues.append(league)
+        self._lock = threading.Lock()
+        self._progress = {league: 'pending' for league in self.leagues}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def progress(self):
+        with self._lock:
+            return dict(self._progress)
+
+    @property
+    def ready(self):
+        return all(state == 'ready' for state in self.progress.values())
+
+    def _set(self, league, state):
+        with self._lock:
+            self._progress[league] = state
+
+    def _run(self):
+        logger.info(f'  Warming up {len(self.leagues)} leagues with {self.workers} workers')
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup') as executor:
+            list(executor.map(self._warm_league, self.leagues))
+        logger.info(f'  Warm-up finished: {self.progress}')
+
+    def _warm_league(self, league):
+        registry = get_registry()
+        try:
+            self._set(league, 'loading')
+            registry.load(league)
+            self._set(league, 'computing')
+            registry.statistic(league)
+            self._set(league, 'rendering')
+            for page in self.pages:
+                if league in page.league_tab_mapping.values():
+                    page.cached_content(league)
+            self._set(league, 'ready')
+        except Exception:
+            logger.exception(f'  Warm-up of {league} failed')
+            self._set(league, 'failed')
+
+
+def register_ready_route(server, warmup=None):
+    # 200 once every league is hot (or when warm-up is off), 503 while it is still running.
+    @server.route('/ready')
+    def ready():
+        if warmup is None:
+            return flask.jsonify(ready=True, leagues={})
+        is_ready = warmup.ready
+        return flask.jsonify(ready=is_ready, leagues=warmup.progress), 200 if is_ready else 503